@@ -37,14 +37,16 @@ class MJLexer(Lexer):
         self._error(msg, t)
 
     def scan(self, data):
-        output = ""
+        # Collect the lines and join them once: repeated `output += ...`
+        # reallocates the whole string on every token
+        lines = []
         for token in self.tokenize(data):
-            token_str = (
-                f"LexToken({token.type},{token.value!r},{token.lineno},{token.index})"
+            token_str = "LexToken(%s,%r,%d,%d)" % (
+                token.type, token.value, token.lineno, token.index
             )
             print(token_str)
-            output += token_str + "\n"
-        return output
+            lines.append(token_str)
+        return "\n".join(lines) + "\n" if lines else ""
 
     # Set of token names.
     tokens = {
@@ -156,8 +158,10 @@ class MJLexer(Lexer):
     # Identifiers
     @_(r"[a-zA-Z_][a-zA-Z0-9_]*")
     def ID(self, t):
-        # Check if the identifier is a reserved word.
-        t.type = self.keywords.get(t.value, "ID")
+        # Check if the identifier is a reserved word. Names are interned so
+        # later symbol table lookups compare them by identity
+        t.value = sys.intern(t.value)
+        t.type = _KEYWORDS.get(t.value, "ID")
         return t
     
     # INT_LITERALS
@@ -167,13 +171,16 @@ class MJLexer(Lexer):
         return t
     
     # CHAR_LITERALS
-    @_(r"'(\\'|\\n|\\t|[^\\'])'")
+    @_(r"'(?:\\'|\\n|\\t|[^\\'])'")
     def CHAR_LITERAL(self, t):
         return t
 
     # STRING_LITERALS
     #@_(r'"(\.|[^"])*"')
-    @_(r'"([^"\\\n\r]|\\.)*"')
+    # Unrolled form of "([^"\\\n\r]|\\.)*": plain characters are consumed in
+    # runs by one character class instead of one alternation (and one
+    # capture) per character
+    @_(r'"[^"\\\n\r]*(?:\\.[^"\\\n\r]*)*"')
     def STRING_LITERAL(self, t):
         return t
 
@@ -213,6 +220,11 @@ class MJLexer(Lexer):
     
 
 
+# Reserved words with interned keys and token types, read by MJLexer.ID
+# without going through the instance attribute lookup of self.keywords
+_KEYWORDS = {sys.intern(k): sys.intern(v) for k, v in MJLexer.keywords.items()}
+
+
 def main():
     # create argument parser
     parser = argparse.ArgumentParser()
@@ -88,6 +88,8 @@ class Node(ABC):
     """Abstract base class for AST nodes."""
 
     attr_names = ()
+    # attributes holding child nodes (or lists of them), in children() order
+    _child_attrs = ()
 
     @abstractmethod
     def __init__(self, coord: Coord = None):
@@ -183,6 +185,7 @@ class ID(Node):
     """Node representing an identifier"""
 
     attr_names = ("name",)
+    _child_attrs = ()
 
     def __init__(self, name: str, coord: Coord = None):
         """
@@ -200,14 +203,17 @@ class Type(Node):
     """Node representing a type specifier"""
 
     attr_names = ("name",)
+    _child_attrs = ()
 
-    def __init__(self, name: str, coord: Coord = None):
+    def __init__(self, name: str, coord: Coord = None, mj_type=None):
         """
         :param name: type name (int, char, ...).
         :param coord: code position.
+        :param mj_type: the MJType of a built-in type, resolved by the parser.
         """
         self.name = name
         self.coord = coord
+        self.mj_type = mj_type
 
     def children(self):
         return ()
@@ -220,6 +226,7 @@ class VarDecl(Node):
     """Node that represents a variable declaration"""
 
     attr_names = ("name",)
+    _child_attrs = ("type", "init")
 
     def __init__(self, type: Type, name: ID, init, coord: Coord = None):
         """
@@ -283,6 +290,7 @@ class ParamDecl(Node):
     """Node representing a parameter declaration"""
 
     attr_names = ("name",)
+    _child_attrs = ("type",)
 
     def __init__(self, type: Type, name: ID, coord: Coord = None):
         """
@@ -305,6 +313,7 @@ class DeclList(Node):
     """Node representing a list of var declarations"""
 
     attr_names = ()
+    _child_attrs = ("decls",)
 
     def __init__(self, decls: list[VarDecl], coord: Coord = None):
         """
@@ -325,6 +334,7 @@ class ParamList(Node):
     """Node representing a list of parameters"""
 
     attr_names = ()
+    _child_attrs = ("params",)
 
     def __init__(self, params: list[ParamDecl], coord: Coord = None):
         """
@@ -350,6 +360,7 @@ class ExprList(Node):
     """Node representing a list of expressions"""
 
     attr_names = ()
+    _child_attrs = ("exprs",)
 
     def __init__(self, exprs: list[Expr], coord: Coord = None):
         """
@@ -372,6 +383,7 @@ class ArrayRef(Expr):
     """Node representing an access to a position in an array"""
 
     attr_names = ()
+    _child_attrs = ("name", "subscript")
 
     def __init__(self, name, subscript, coord: Coord = None):
         """
@@ -396,6 +408,7 @@ class Assignment(Expr):
     """Node representing an Assigment Expression"""
 
     attr_names = ("op",)
+    _child_attrs = ("lvalue", "rvalue")
 
     def __init__(self, op: str, lvalue: Expr, rvalue: Expr, coord: Coord = None):
         """
@@ -422,6 +435,7 @@ class BinaryOp(Expr):
     "Node representing a Binary Expression."
 
     attr_names = ("op",)
+    _child_attrs = ("lvalue", "rvalue")
 
     def __init__(self, op: str, left: Expr, right: Expr, coord: Coord = None):
         """
@@ -448,6 +462,7 @@ class UnaryOp(Expr):
     """Node representing a unary expression"""
 
     attr_names = ("op",)
+    _child_attrs = ("expr",)
 
     def __init__(self, op: str, expr: Expr, coord: Coord = None):
         """
@@ -469,6 +484,7 @@ class Constant(Expr):
     "Node representing a constant"
 
     attr_names = ("type", "value")
+    _child_attrs = ()
 
     def __init__(self, type: str, value, coord: Coord = None):
         """
@@ -488,6 +504,7 @@ class FieldAccess(Expr):
     """Node representing access to a field of an object"""
 
     attr_names = ()
+    _child_attrs = ("object", "field_name")
 
     def __init__(
         self,
@@ -516,6 +533,7 @@ class MethodCall(Expr):
     """node representing the invocation of a method"""
 
     attr_names = ()
+    _child_attrs = ("object", "method_name", "args")
 
     def __init__(
         self,
@@ -565,6 +583,7 @@ class Length(Expr):
     """Node representing access to the length of an array or string"""
 
     attr_names = ()
+    _child_attrs = ("expr",)
 
     def __init__(self, expr: Expr, coord: Coord = None):
         """
@@ -584,6 +603,7 @@ class NewArray(Expr):
     """Expression representing a New Array allocation."""
 
     attr_names = ()
+    _child_attrs = ("type", "size")
 
     def __init__(self, type: Type, size: Expr, coord: Coord = None):
         """
@@ -608,6 +628,7 @@ class NewObject(Expr):
     """Node representing a New Object allocation."""
 
     attr_names = ()
+    _child_attrs = ("type",)
 
     def __init__(self, type: Type, coord: Coord = None):
         """
@@ -631,6 +652,7 @@ class Assert(Statement):
     """Node representing an Assert statment"""
 
     attr_names = ()
+    _child_attrs = ("expr",)
 
     def __init__(self, expr: Expr, coord: Coord = None):
         """
@@ -651,6 +673,7 @@ class Compound(Statement):
     """Node representing the Compound Statement (block of code)"""
 
     attr_names = ()
+    _child_attrs = ("statements",)
 
     def __init__(self, statements: list[Statement], coord: Coord = None):
         """
@@ -671,6 +694,7 @@ class For(Statement):
     """Node representing the For statement"""
 
     attr_names = ()
+    _child_attrs = ("init", "cond", "next", "body")
 
     def __init__(
         self,
@@ -710,6 +734,7 @@ class While(Statement):
     """Node representing the While statement"""
 
     attr_names = ()
+    _child_attrs = ("cond", "body")
 
     def __init__(self, cond: Expr, body: Statement, coord: Coord = None):
         """
@@ -734,6 +759,7 @@ class If(Statement):
     """Node representing the If statement"""
 
     attr_names = ()
+    _child_attrs = ("cond", "iftrue", "iffalse")
 
     def __init__(
         self, cond: Expr, iftrue: Statement, iffalse: Statement, coord: Coord = None
@@ -764,6 +790,7 @@ class Print(Statement):
     """Node represeting the Print statement"""
 
     attr_names = ()
+    _child_attrs = ("expr",)
 
     def __init__(self, expr: Expr | ExprList, coord: Coord = None):
         """
@@ -784,6 +811,7 @@ class Return(Statement):
     """Node representing the Return statement"""
 
     attr_names = ()
+    _child_attrs = ("expr",)
 
     def __init__(self, expr: Expr, coord: Coord = None):
         """
@@ -804,6 +832,7 @@ class Break(Statement):
     "Node representing the break statement"
 
     attr_names = ()
+    _child_attrs = ()
 
     def __init__(self, coord: Coord = None):
         self.coord = coord
@@ -816,6 +845,7 @@ class InitList(Node):
     """Node representing a list of variable initializers"""
 
     attr_names = ()
+    _child_attrs = ("exprs",)
 
     def __init__(self, exprs: list[Expr], coord: Coord = None):
         """
@@ -837,6 +867,7 @@ class MethodDecl(Node):
     """Node representing the declaration of a regular method"""
 
     attr_names = ("name",)
+    _child_attrs = ("type", "param_list", "body")
 
     def __init__(
         self,
@@ -896,6 +927,7 @@ class MainMethodDecl(Node):
     """Node represeting the Main Method Declaration"""
 
     attr_names = ()
+    _child_attrs = ("args", "body")
 
     def __init__(
         self,
@@ -924,6 +956,7 @@ class Extends(Node):
     """Node representing inheritance between classes"""
 
     attr_names = ("super",)
+    _child_attrs = ()
 
     def __init__(self, super: ID, coord: Coord = None):
         """
@@ -940,6 +973,7 @@ class ClassDecl(Node):
     """Node representing a Class Declaration"""
 
     attr_names = ("name",)
+    _child_attrs = ("extends", "var_decls", "method_decls")
 
     def __init__(
         self,
@@ -979,6 +1013,7 @@ class Program(Node):
     """Node that represent the MiniJava Program"""
 
     attr_names = ()
+    _child_attrs = ("class_decls",)
 
     def __init__(self, class_decls: list[ClassDecl], coord: Coord = None):
         """
@@ -159,6 +159,7 @@ class MJLexer(Lexer):
     def ID(self, t):
         # Check if the identifier is a reserved word.
         t.type = self.keywords.get(t.value, "ID")
+        t.value = sys.intern(t.value)
         return t
     
     # INT_LITERALS
@@ -7,6 +7,7 @@ from sly import Parser
 
 from mjc.mj_ast import *
 from mjc.mj_lexer import MJLexer
+from mjc.mj_type import TYPEMAP
 
 
 class Coord:
@@ -375,31 +376,59 @@ class MJParser(Parser):
     # <type_specifier> ::= "void"| "boolean"| "char"| "int"| "String"| "char" "[" "]"| "int" "[" "]"| <identifier>
     @_("VOID")
     def type_specifier(self, p):
-        return Type(name="void", coord=self._token_coord(p._slice[0]))
+        return Type(
+            name="void",
+            mj_type=TYPEMAP["void"],
+            coord=self._token_coord(p._slice[0]),
+        )
 
     @_("BOOLEAN")
     def type_specifier(self, p):
-        return Type(name="boolean", coord=self._token_coord(p._slice[0]))
+        return Type(
+            name="boolean",
+            mj_type=TYPEMAP["boolean"],
+            coord=self._token_coord(p._slice[0]),
+        )
 
     @_("CHAR")
     def type_specifier(self, p):
-        return Type(name="char", coord=self._token_coord(p._slice[0]))
+        return Type(
+            name="char",
+            mj_type=TYPEMAP["char"],
+            coord=self._token_coord(p._slice[0]),
+        )
 
     @_("INT")
     def type_specifier(self, p):
-        return Type(name="int", coord=self._token_coord(p._slice[0]))
+        return Type(
+            name="int",
+            mj_type=TYPEMAP["int"],
+            coord=self._token_coord(p._slice[0]),
+        )
 
     @_("STRING")
     def type_specifier(self, p):
-        return Type(name="String", coord=self._token_coord(p._slice[0]))
+        return Type(
+            name="String",
+            mj_type=TYPEMAP["String"],
+            coord=self._token_coord(p._slice[0]),
+        )
 
     @_("CHAR LBRACK RBRACK")
     def type_specifier(self, p):
-        return Type(name="char[]", coord=self._token_coord(p._slice[0]))
+        return Type(
+            name="char[]",
+            mj_type=TYPEMAP["char[]"],
+            coord=self._token_coord(p._slice[0]),
+        )
     
     @_("INT LBRACK RBRACK")
     def type_specifier(self, p):
-        return Type(name="int[]", coord=self._token_coord(p._slice[0]))
+        return Type(
+            name="int[]",
+            mj_type=TYPEMAP["int[]"],
+            coord=self._token_coord(p._slice[0]),
+        )
     
     @_("ID")
     def type_specifier(self, p):
@@ -435,7 +464,7 @@ class MJParser(Parser):
     @_('unary_expression ASSIGN assignment_expression')
     def assignment_expression(self, p):
         return Assignment(
-            op=p.ASSIGN,
+            op=sys.intern(p.ASSIGN),
             lvalue=p.unary_expression, 
             rvalue=p.assignment_expression, coord=self._token_coord(p._slice[0]))
     
@@ -456,7 +485,7 @@ class MJParser(Parser):
 
     def buildBinaryOPTION(self, p, op):
         return BinaryOp(
-            op = op,
+            op = sys.intern(op),
             left = p.binary_expression0, 
             right = p.binary_expression1,
             coord  = self._token_coord(p._slice[0])
@@ -525,7 +554,7 @@ class MJParser(Parser):
     @_("unary_operator unary_expression")
     def unary_expression(self, p):
         return UnaryOp(
-            op= p.unary_operator, 
+            op= sys.intern(p.unary_operator), 
             expr= p.unary_expression, 
             coord = self._token_coord(p._slice[0])
         )
@@ -689,7 +718,7 @@ class MJParser(Parser):
     @_("NEW CHAR LBRACK expression RBRACK")
     def new_expression(self, p):
         return NewArray(
-            type=Type(name="char[]"), 
+            type=Type(name="char[]", mj_type=TYPEMAP["char[]"]), 
             size=p.expression, 
             coord=self._token_coord(p._slice[0])
         )
@@ -697,7 +726,7 @@ class MJParser(Parser):
     @_("NEW INT LBRACK expression RBRACK")
     def new_expression(self, p):
         return NewArray(
-            type=Type(name="int[]"),
+            type=Type(name="int[]", mj_type=TYPEMAP["int[]"]),
             size=p.expression, 
             coord=self._token_coord(p._slice[0]))
 
@@ -1,9 +1,11 @@
 import argparse
+import functools
 import pathlib
 import sys
-from copy import deepcopy
-from typing import Any, Dict, Union
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Mapping, Union
 
+from mjc import mj_ast
 from mjc.mj_ast import *
 from mjc.mj_parser import MJParser
 from mjc.mj_serror import SE, assert_semantic
@@ -16,7 +18,7 @@ from mjc.mj_type import (
     MJType,
     ObjectType,
     StringType,
-    StringArrayType,
+    TYPEMAP,
     VoidType,
     MethodType,
 )
@@ -37,9 +39,9 @@ class SymbolTable:
         self.__data = dict()
 
     @property
-    def data(self) -> Dict[str, Any]:
-        """Returns a copy of the SymbolTable."""
-        return deepcopy(self.__data)
+    def data(self) -> Mapping[str, Any]:
+        """Returns a read-only view of the SymbolTable."""
+        return MappingProxyType(self.__data)
 
     def add(self, name: str, value: Any) -> None:
         """Adds to the SymbolTable.
@@ -49,6 +51,10 @@ class SymbolTable:
         """
         self.__data[name] = value
 
+    def bulk_add(self, items) -> None:
+        """Adds every (name, value) pair of `items` to the SymbolTable."""
+        self.__data.update(items)
+
     def lookup(self, name: str) -> Union[Any, None]:
         """Searches `name` on the SymbolTable and returns the value
         assigned to it.
@@ -57,6 +63,15 @@ class SymbolTable:
         :return: the value assigned to `name` on the SymbolTable. If `name` is not found, `None` is returned.
         """
         return self.__data.get(name)
+
+    def lookup_or(self, name: str, default: Any) -> Any:
+        """Returns the value assigned to `name`, or `default` if it is not on the
+        SymbolTable.
+        """
+        return self.__data.get(name, default)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.__data
     
     #""" check if an ID(variable name, parameter name, etc) has already been declared in the 
     #    current scope, instead of look up the whole program"""
@@ -76,7 +91,8 @@ class ScopedSymbolTable:
     
     def push_scope(self):
         #print("PUSHING scope")
-        self.scope_stack.append(SymbolTable())
+        # each scope is a plain dict, so every level of the chain is one hash probe
+        self.scope_stack.append({})
 
     def pop_scope(self):
         #print("POPING scope")
@@ -84,21 +100,38 @@ class ScopedSymbolTable:
     
     def add(self, name, value):
         #print(f"ADD: {name} -> {value}")
-        self.scope_stack[-1].add(name, value)
+        self.scope_stack[-1][name] = value
+
+    def bulk_add(self, items):
+        self.scope_stack[-1].update(items)
 
     def lookup(self, name):
         #print(f"LOOKUP: {name}")
         # we are dealing with this as a stack, the last scope is at the end of the list,
         # to garantee the LIFO behavior we reversed
         for scope in reversed(self.scope_stack):
-            resp = scope.lookup(name)
+            resp = scope.get(name)
             if resp is not None:
                 #print(f"  FOUND in scope: {name} -> {resp}")
                 return resp
         #print(f"  NOT FOUND: {name}")
+
+    def lookup_or(self, name, default):
+        for scope in reversed(self.scope_stack):
+            resp = scope.get(name)
+            if resp is not None:
+                return resp
+        return default
+
+    def __contains__(self, name):
+        # same visibility as lookup: any scope on the chain
+        for scope in reversed(self.scope_stack):
+            if name in scope:
+                return True
+        return False
     
     def lookup_in_current_scope(self, name):
-        return name in self.scope_stack[-1].data
+        return name in self.scope_stack[-1]
 
 # Store name, return type and param type from each method.
 # Allow later check, e.g. methods call with right arguments
@@ -112,6 +145,22 @@ class MethodSymbol:
         return f"<MethodSymbol name={self.name}, return_type={self.return_type}, params={self.params}>"
 
 
+def _memoized(visit):
+    """Caches the type a visitor infers for a node, keyed by the node's id.
+    Only for visitors that do not touch the symbol tables.
+    """
+
+    @functools.wraps(visit)
+    def wrapper(self, node):
+        key = id(node)
+        if key in self._sema_cache:
+            return self._sema_cache[key]
+        result = self._sema_cache[key] = visit(self, node)
+        return result
+
+    return wrapper
+
+
 class NodeVisitor:
     """A base NodeVisitor class for visiting uc_ast nodes.
     Subclass it and define your own visit_XXX methods, where
@@ -119,28 +168,51 @@ class NodeVisitor:
     methods.
     """
 
-    _method_cache = None
+    _dispatch: Dict[type, Callable] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Map each AST class to its visit_XXX function once, when the visitor
+        # class is created, so visit() is a single dict lookup by node type.
+        cls._dispatch = {}
+        for attr in dir(cls):
+            if not attr.startswith("visit_"):
+                continue
+            ast_class = getattr(mj_ast, attr[len("visit_") :], None)
+            if isinstance(ast_class, type):
+                cls._dispatch[ast_class] = getattr(cls, attr)
 
     def visit(self, node):
         """Visit a node."""
-
-        if self._method_cache is None:
-            self._method_cache = {}
-
-        visitor = self._method_cache.get(node.__class__.__name__)
-        if visitor is None:
-            method = "visit_" + node.__class__.__name__
-            visitor = getattr(self, method, self.generic_visit)
-            self._method_cache[node.__class__.__name__] = visitor
-
-        return visitor(node)
+        return self._dispatch.get(type(node), type(self).generic_visit)(self, node)
 
     def generic_visit(self, node):
         """Called if no explicit visitor function exists for a
         node. Implements preorder visiting of the node.
+
+        Descendants without a visit_XXX method of their own are expanded
+        on an explicit stack instead of recursing through visit().
         """
-        for _, child in node.children():
-            self.visit(child)
+        dispatch = self._dispatch
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            if current is not node:
+                visitor = dispatch.get(type(current))
+                if visitor is not None:
+                    visitor(self, current)
+                    continue
+            children = []
+            for attr in type(current)._child_attrs:
+                child = getattr(current, attr)
+                if child is None:
+                    continue
+                if isinstance(child, list):
+                    children.extend(child)
+                else:
+                    children.append(child)
+            # reversed, so the first child is popped (visited) first
+            stack.extend(reversed(children))
 
 
 class SymbolTableBuilder(NodeVisitor):
@@ -152,18 +224,7 @@ class SymbolTableBuilder(NodeVisitor):
     def __init__(self):
         #self.global_symtab = SymbolTable()
         self.global_symtab = ScopedSymbolTable("global", parent=None)
-        self.typemap = {
-            "boolean": BooleanType,
-            "char": CharType,
-            "int": IntType,
-            "String": StringType,
-            "String[]": StringArrayType,
-            "void": VoidType,
-            "int[]": IntArrayType,
-            "char[]": CharArrayType,
-            "method": MethodType,
-            "object": ObjectType,
-        }
+        self.typemap = TYPEMAP
     
     def visit_Program(self, node: Program):
         #print("SB_Program::\n", node)
@@ -176,7 +237,7 @@ class SymbolTableBuilder(NodeVisitor):
 
             # Verifica duplicata aqui antes de adicionar
             assert_semantic(
-                condition=(self.global_symtab.lookup(class_name) is None),
+                condition=(class_name not in self.global_symtab),
                 error_type=SE.ALREADY_DECLARED_CLASS,
                 coord=class_decl.coord,
                 name=class_name,
@@ -228,7 +289,7 @@ class SymbolTableBuilder(NodeVisitor):
         # First, check if the field has already been declared
         #thow an semantic error
         assert_semantic(
-            condition=(self.current_class.lookup(node.name.name) is None), 
+            condition=(node.name.name not in self.current_class), 
             error_type=SE.ALREADY_DECLARED_FIELD,
             coord=node.coord,
             name=node.name.name,
@@ -236,7 +297,7 @@ class SymbolTableBuilder(NodeVisitor):
 
         # Now, record the field and its type
         # from SymbolTableBuilder we get the typemap, node.name.name == "int", then we save in var_type_field = IntType
-        var_type_field = self.typemap.get(node.type.name)
+        var_type_field = node.type.mj_type
         if var_type_field is None:
             var_type_field = self.global_symtab.lookup(node.type.name)
             assert_semantic(
@@ -256,13 +317,13 @@ class SymbolTableBuilder(NodeVisitor):
     def visit_MethodDecl(self, node: MethodDecl):
         # First, check if the method has already been declared
         assert_semantic(
-            condition=(self.current_class.lookup(node.name.name) is None), 
+            condition=(node.name.name not in self.current_class), 
             error_type=SE.ALREADY_DECLARED_METHOD,
             coord=node.coord,
             name=node.name.name,
         )
 
-        return_type_class = self.typemap.get(node.type.name)         
+        return_type_class = node.type.mj_type         
         assert_semantic(
             condition=(return_type_class is not None), 
             error_type=SE.RETURN_TYPE_MISMATCH,
@@ -284,7 +345,7 @@ class SymbolTableBuilder(NodeVisitor):
         param_types = []
         param_names = []
         for param in param_list:
-            param_type_method = self.typemap.get(param.type.name)
+            param_type_method = param.type.mj_type
             
             assert_semantic(
                 condition=(param_type_method is not None),
@@ -305,7 +366,7 @@ class SymbolTableBuilder(NodeVisitor):
         # The main method must have the name "main"
         # First, check if the main method has already been declared
         assert_semantic(
-            condition=(self.current_class.lookup("main") is None),
+            condition=("main" not in self.current_class),
             error_type=SE.ALREADY_DECLARED_METHOD,
             coord=node.coord,
             name="main",
@@ -332,22 +393,12 @@ class SemanticAnalyzer(NodeVisitor):
         """
         self.global_symtab = global_symtab
         self.scope = ScopedSymbolTable()
-        self.typemap = {
-            "boolean": BooleanType,
-            "char": CharType,
-            "int": IntType,
-            "String": StringType,
-            "String[]": StringArrayType,
-            "void": VoidType,
-            "int[]": IntArrayType,
-            "char[]": CharArrayType,
-            "method": MethodType,
-            "object": ObjectType,
-        }
+        self.typemap = TYPEMAP
         self.main_declared = False
         self.current_class_name = None
         self.current_method_return_type = None
         self.current_loop = None
+        self._sema_cache: Dict[int, MJType] = {}
 
 
     def _find_field_in_class_or_super(self, class_scope, field_name, coord):
@@ -458,7 +509,7 @@ class SemanticAnalyzer(NodeVisitor):
     def visit_VarDecl(self, node: VarDecl):
         #print(f"[DEBUG] VarDecl {node.name.name} init type: {type(node.init)}")
         class_name = node.type.name.name if hasattr(node.type.name, 'name') else node.type.name
-        declared_type_class = self.typemap.get(class_name) # Get the declared type "int", "char[]
+        declared_type_class = node.type.mj_type # Get the declared type "int", "char[]
 
         # If didn't find the type in the typemap, try find in global_symtab
         if declared_type_class is None:
@@ -530,15 +581,20 @@ class SemanticAnalyzer(NodeVisitor):
         if isinstance(param_list, ParamList):
             param_list = param_list.params
         
-        # Add the params to the scope
-        for param, param_type in zip(param_list, method_info.param_types):
-            assert_semantic(
-                condition=not self.scope.lookup_in_current_scope(param.name.name),
-                error_type=SE.PARAMETER_ALREADY_DECLARED,
-                coord=param.coord,
-                name=param.name.name,
-            )
-            self.scope.add(param.name.name, param_type)
+        # Add the params to the scope. It was just pushed, so the only possible
+        # clashes are between the params themselves: check them all at once
+        names = [param.name.name for param in param_list]
+        if len(set(names)) < len(names):
+            seen = set()
+            for param, name in zip(param_list, names):
+                assert_semantic(
+                    condition=name not in seen,
+                    error_type=SE.PARAMETER_ALREADY_DECLARED,
+                    coord=param.coord,
+                    name=name,
+                )
+                seen.add(name)
+        self.scope.bulk_add(zip(names, method_info.param_types))
 
         # Visit body's method
         self.visit(node.body)
@@ -608,7 +664,7 @@ class SemanticAnalyzer(NodeVisitor):
 
 
     def visit_ParamDecl(self, node: ParamDecl):
-        param_type_class = self.typemap.get(node.type.name)
+        param_type_class = node.type.mj_type
         assert_semantic(
             condition=(param_type_class is not None),
             error_type=SE.UNDECLARED_CLASS,
@@ -811,29 +867,37 @@ class SemanticAnalyzer(NodeVisitor):
         return lvalue_type
 
 
-    def visit_BinaryOp(self, node: BinaryOp):
+    @_memoized
+    def visit_BinaryOp(
+        self,
+        node: BinaryOp,
+        _assert=assert_semantic,
+        _mismatch=SE.BINARY_EXPRESSION_TYPE_MISMATCH,
+    ):
         #print(f"[DEBUG] visit_BinaryOp: {node.op} @ {node.coord}")
-        
-        rtype = self.visit(node.rvalue)
-        ltype = self.visit(node.lvalue)
+        # hot names bound as locals/default args: this runs once per expression
+        visit = self.visit
+        op = node.op
+
+        rtype = visit(node.rvalue)
+        ltype = visit(node.lvalue)
         
         # Check if left and right operands have the same type
-        assert_semantic(
+        _assert(
             condition=self.is_type_compatible(ltype, rtype),
-            error_type=SE.BINARY_EXPRESSION_TYPE_MISMATCH,
+            error_type=_mismatch,
             coord=node.coord,
-            name=node.op,
+            name=op,
         )
   
         # Check if the operation is supported by the type 
         # Assign the type of the result of the binary expression
-        if node.op in ltype.binary_ops:
-            return ltype  # ops like +, -, *, etc
-
-        elif node.op in ltype.rel_ops:
-            return BooleanType  # op like ==, <, >=, etc
+        # ops like +, -, * keep ltype; ==, <, >= etc. give BooleanType
+        result_type = ltype._result_of.get(op)
+        if result_type is not None:
+            return result_type
 
-        elif node.op in {"&&", "||"}:
+        elif op in {"&&", "||"}:
             assert_semantic(
                 condition=(ltype == BooleanType),
                 error_type=SE.UNSUPPORTED_BINARY_OPERATION,
@@ -853,6 +917,7 @@ class SemanticAnalyzer(NodeVisitor):
         )
         
 
+    @_memoized
     def visit_UnaryOp(self, node: UnaryOp):
         expr_type = self.visit(node.expr)
         #print(f"[DEBUG UnaryOP] UnaryOp: op={node.op}, expr_type={expr_type}")
@@ -884,6 +949,7 @@ class SemanticAnalyzer(NodeVisitor):
         )
 
 
+    @_memoized
     def visit_ArrayRef(self, node: ArrayRef):
         
         subscript_type = self.visit(node.subscript)
@@ -1087,6 +1153,7 @@ class SemanticAnalyzer(NodeVisitor):
         return node.type
 
 
+    @_memoized
     def visit_Constant(self, node: Constant):
         value = node.value
         #print("[DEBUG]-SA_Constant::", node, "  visit_Constant:", node.value, "type:", node.type)
@@ -1113,15 +1180,19 @@ class SemanticAnalyzer(NodeVisitor):
         return node.type
     
 
-    def visit_ID(self, node: ID):
+    @_memoized
+    def visit_ID(
+        self, node: ID, _assert=assert_semantic, _undeclared=SE.UNDECLARED_NAME
+    ):
         #print(f"[DEBUG-ID] Looking up {node.name}")
-        symbol = self.scope.lookup(node.name)
+        name = node.name
+        symbol = self.scope.lookup(name)
 
-        assert_semantic(
+        _assert(
             condition=symbol is not None,
-            error_type=SE.UNDECLARED_NAME,
+            error_type=_undeclared,
             coord=node.coord,
-            name=node.name,
+            name=name,
         )
 
         node.type = symbol
@@ -1129,7 +1200,7 @@ class SemanticAnalyzer(NodeVisitor):
 
 
     def visit_Type(self, node: Type):
-        node.type = self.typemap.get(node.name)
+        node.type = node.mj_type
         return node.type
 
 
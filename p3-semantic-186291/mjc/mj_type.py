@@ -1,20 +1,45 @@
+import sys
+from types import MappingProxyType
+
+
 class MJType:
     """
     Class that represents a type in the MiniJava language.  Basic
-    Types are declared as singleton instances of this type.
+    Types are declared as singleton instances of this type, so two basic
+    types are equal only if they are the same object.
     """
 
+    __slots__ = (
+        "typename",
+        "unary_ops",
+        "binary_ops",
+        "rel_ops",
+        "assign_ops",
+        "_result_of",
+    )
+
     def __init__(
-        self, name, binary_ops=set(), unary_ops=set(), rel_ops=set(), assign_ops=set()
+        self, name, binary_ops=None, unary_ops=None, rel_ops=None, assign_ops=None
     ):
         """
         You must implement yourself and figure out what to store.
         """
         self.typename = name
-        self.unary_ops = unary_ops
-        self.binary_ops = binary_ops
-        self.rel_ops = rel_ops
-        self.assign_ops = assign_ops
+        # Operators are interned, as are the ones the parser puts in the AST,
+        # so membership tests compare by identity.
+        self.unary_ops = frozenset(map(sys.intern, unary_ops or ()))
+        self.binary_ops = frozenset(map(sys.intern, binary_ops or ()))
+        self.rel_ops = frozenset(map(sys.intern, rel_ops or ()))
+        self.assign_ops = frozenset(map(sys.intern, assign_ops or ()))
+        # Result type of each binary operator: relational ones give a boolean,
+        # the others keep the operand type. BooleanType is the first instance
+        # built, so it is its own boolean.
+        boolean = self if name == "boolean" else BooleanType
+        self._result_of = dict.fromkeys(self.rel_ops, boolean)
+        self._result_of.update(dict.fromkeys(self.binary_ops, self))
+
+    __eq__ = object.__eq__
+    __hash__ = object.__hash__
 
     def __str__(self):
         return f"type({self.typename})"
@@ -91,6 +116,8 @@ VoidType = MJType(
 
 # Array & Object types need to be instantiated for each declaration
 class ArrayType(MJType):
+    __slots__ = ("size", "element_type")
+
     def __init__(self, array_type: str, element_type: str, size=None):
         """
         :param array_type: Type of the array (int[] or char[])
@@ -144,3 +171,20 @@ class MethodType(MJType):
             self.return_type == other.return_type
             and self.param_types == other.param_types
         )
+
+
+# Type names to their MJType, shared by the parser and the semantic visitors.
+TYPEMAP = MappingProxyType(
+    {
+        "boolean": BooleanType,
+        "char": CharType,
+        "int": IntType,
+        "String": StringType,
+        "String[]": StringArrayType,
+        "void": VoidType,
+        "int[]": IntArrayType,
+        "char[]": CharArrayType,
+        "method": MethodType,
+        "object": ObjectType,
+    }
+)
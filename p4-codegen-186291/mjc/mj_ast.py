@@ -87,6 +87,12 @@ class Coord:
 class Node(ABC):
     """Abstract base class for AST nodes."""
 
+    # Attributes written by the code generator on (almost) every node are
+    # stored in slots; everything else still goes to the instance __dict__.
+    __slots__ = (
+        "gen_loc", "gen_is_temp", "target_reg", "parent", "cfg", "gen_values", "__dict__",
+    )
+
     attr_names = ()
 
     @abstractmethod
@@ -67,6 +67,8 @@ def format_instruction(t: tuple) -> str:
 
 
 class Block:
+    __slots__ = ("label", "instructions", "predecessors", "next_block")
+
     def __init__(self, label: str):
         self.label: str = label  # Label that identifies the block
         self.instructions: List[Tuple[str]] = []  # Instructions in the block
@@ -86,6 +88,8 @@ class BasicBlock(Block):
     flows to the next block.
     """
 
+    __slots__ = ("branch",)
+
     def __init__(self, label: str):
         super(BasicBlock, self).__init__(label)
         self.branch: Optional[Block] = (
@@ -99,6 +103,8 @@ class ConditionBlock(Block):
     There are two branches to handle each possibility.
     """
 
+    __slots__ = ("taken", "fall_through")
+
     def __init__(self, label: str):
         super(ConditionBlock, self).__init__(label)
         self.taken: Optional[Block] = None
@@ -1,7 +1,9 @@
 import argparse
+import collections
+import operator
 import pathlib
 import sys
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
 
 from mjc.mj_ast import *
 from mjc.mj_block import (
@@ -19,6 +21,348 @@ from mjc.mj_type import CharType, IntType, VoidType, ObjectType
 
 import rich
 
+
+# Opcode names are built from a small, fixed vocabulary of types
+# (int, boolean, char[], ... plus the user classes), so the typed
+# opcodes of each type are formatted once into a record and the
+# interned strings are reused by every emit site. Instructions stay
+# plain tuples: the interpreter, EmitBlocks and format_instruction all
+# consume them as such.
+class _TypeOps(NamedTuple):
+    alloc: str
+    store: str
+    load: str
+    field: str
+    print: str
+
+
+_TYPE_OPS: Dict[str, _TypeOps] = {}
+
+
+def _type_ops(typename: str) -> _TypeOps:
+    ops = _TYPE_OPS.get(typename)
+    if ops is None:
+        ops = _TYPE_OPS[typename] = _TypeOps(
+            *(sys.intern(kind + "_" + typename) for kind in _TypeOps._fields)
+        )
+    return ops
+
+
+for _t in ("int", "boolean", "char", "int[]", "boolean[]", "char[]", "String"):
+    _type_ops(_t)
+
+
+_MANGLED: Dict[Tuple[str, str], str] = {}
+
+
+def _mangle(prefix: str, typename: str) -> str:
+    """Interned ``prefix_typename`` opcode, formatted once per combination."""
+    key = (prefix, typename)
+    opcode = _MANGLED.get(key)
+    if opcode is None:
+        opcode = _MANGLED[key] = sys.intern(prefix + "_" + typename)
+    return opcode
+
+
+_BIN_OP: Dict[str, str] = {
+    "+":  "add_int",
+    "-":  "sub_int",
+    "*":  "mul_int",
+    "/":  "div_int",
+    "%":  "mod_int",
+    "==": "eq_int",
+    "!=": "ne_int",
+    "<":  "lt_int",
+    "<=": "le_int",
+    ">":  "gt_int",
+    ">=": "ge_int",
+    "&&": "and_boolean",
+    "||": "or_boolean",
+}
+
+
+def _alloc(typename: str) -> str:
+    return _type_ops(typename).alloc
+
+
+def _store(typename: str) -> str:
+    return _type_ops(typename).store
+
+
+def _load(typename: str) -> str:
+    return _type_ops(typename).load
+
+
+def _field(typename: str) -> str:
+    return _type_ops(typename).field
+
+
+def _print(typename: str) -> str:
+    return _type_ops(typename).print
+
+
+def _strip_array(typename: str) -> str:
+    """Element type of an array type name, Ex: 'int[]' -> 'int'."""
+    return typename[:-2] if typename.endswith("[]") else typename
+
+
+def _is_label(instr) -> bool:
+    return len(instr) == 1 and instr[0].endswith(":")
+
+
+def _operand_names(operands):
+    """Yield every register/label name mentioned by an instruction operand."""
+    for operand in operands:
+        if isinstance(operand, str):
+            yield operand
+            # field addresses like '%5.x' also use the object register
+            if "." in operand:
+                yield operand.split(".", 1)[0]
+        elif isinstance(operand, (list, tuple)):
+            yield from _operand_names(operand)
+
+
+def _simplify_method(instrs: list) -> list:
+    # Drop unreachable code: anything after a jump/return up to the next label
+    live = []
+    reachable = True
+    for instr in instrs:
+        if _is_label(instr):
+            reachable = True
+        if not reachable:
+            continue
+        live.append(instr)
+        if instr[0] == "jump" or instr[0].startswith("return_"):
+            reachable = False
+
+    # Drop 'jump %L' immediately followed by 'L:' (only for labels defined
+    # once, since the interpreter resolves a jump to the last definition)
+    defs = collections.Counter("%" + i[0][:-1] for i in live if _is_label(i))
+    threaded = []
+    for k, instr in enumerate(live):
+        if (
+            instr[0] == "jump"
+            and k + 1 < len(live)
+            and live[k + 1] == (instr[1][1:] + ":",)
+            and defs[instr[1]] == 1
+        ):
+            continue
+        threaded.append(instr)
+
+    # Coalesce blocks whose label is no longer the target of any branch
+    targets = set()
+    uses = collections.Counter()
+    for instr in threaded:
+        if instr[0] == "jump":
+            targets.add(instr[1])
+        elif instr[0] == "cbranch":
+            targets.update(instr[2:])
+        uses.update(_operand_names(instr[1:]))
+
+    result = []
+    for instr in threaded:
+        if _is_label(instr):
+            if instr[0] != "entry:" and "%" + instr[0][:-1] not in targets:
+                continue
+        elif instr[0].startswith(("load_", "literal_")) and len(instr) == 3:
+            # Trivially dead: a temporary that nobody reads
+            target = instr[2]
+            if target[1:].isdigit() and uses[target] == 1:
+                continue
+        result.append(instr)
+    return result
+
+
+# Peephole rules applied to the tail of the current block right after an
+# expression is emitted. A rule gets the last few instructions and, on a
+# match, returns (k, replacement, loc): the last k instructions become
+# `replacement` and `loc` is where the value of the expression now lives.
+_Rewrite = Tuple[int, List[tuple], str]
+
+_FOLD_OPS: Dict[str, Callable] = {
+    "add_int": operator.add,
+    "sub_int": operator.sub,
+    "mul_int": operator.mul,
+    "div_int": operator.floordiv,
+    "mod_int": operator.mod,
+    "lt_int": operator.lt,
+    "le_int": operator.le,
+    "gt_int": operator.gt,
+    "ge_int": operator.ge,
+    "eq_int": operator.eq,
+    "ne_int": operator.ne,
+    "and_boolean": lambda a, b: a and b,
+    "or_boolean": lambda a, b: a or b,
+}
+
+
+def _is_literal(instr) -> bool:
+    return instr[0].startswith("literal_") and len(instr) == 3
+
+
+def _fold(opcode: Optional[str], left, right):
+    """Compile-time value of `left opcode right`, or None if it can't be folded."""
+    fold = _FOLD_OPS.get(opcode)
+    if fold is None or not (isinstance(left, int) and isinstance(right, int)):
+        return None
+    if opcode in ("div_int", "mod_int") and right == 0:
+        return None
+    return fold(left, right)
+
+
+def _literal_op(value) -> str:
+    return "literal_boolean" if isinstance(value, bool) else "literal_int"
+
+
+def _fold_constants(tail) -> Optional[_Rewrite]:
+    """literal a; literal b; op a b -> r   =>   literal (a op b) -> r"""
+    if len(tail) < 3:
+        return None
+    lit1, lit2, instr = tail[-3:]
+    if not (_is_literal(lit1) and _is_literal(lit2)) or len(instr) != 4:
+        return None
+    values = {lit1[2]: lit1[1], lit2[2]: lit2[1]}
+    if {instr[1], instr[2]} != values.keys():
+        return None
+    value = _fold(instr[0], values[instr[1]], values[instr[2]])
+    if value is None:
+        return None
+    return 3, [(_literal_op(value), value, instr[3])], instr[3]
+
+
+def _drop_identity(tail) -> Optional[_Rewrite]:
+    """x + 0, 0 + x, x - 0, x * 1, 1 * x, x / 1   =>   x"""
+    if len(tail) < 2:
+        return None
+    instr = tail[-1]
+    if len(instr) != 4 or instr[0] not in ("add_int", "sub_int", "mul_int", "div_int"):
+        return None
+    unit = 0 if instr[0] in ("add_int", "sub_int") else 1
+    commutative = instr[0] in ("add_int", "mul_int")
+    # The literal is either right before the operation or, when it is the
+    # left operand, right before the instruction that computed the other one
+    for k in (2, 3):
+        if len(tail) < k:
+            break
+        lit = tail[-k]
+        if lit[0] != "literal_int" or isinstance(lit[1], bool) or lit[1] != unit:
+            continue
+        if instr[2] == lit[2]:
+            other = instr[1]
+        elif instr[1] == lit[2] and commutative:
+            other = instr[2]
+        else:
+            continue
+        return k, list(tail[-k + 1:-1]), other
+    return None
+
+
+def _drop_double_not(tail) -> Optional[_Rewrite]:
+    """load_boolean x -> a; not a -> b; load_boolean b -> c; not c -> d   =>   a"""
+    if len(tail) < 4:
+        return None
+    load1, not1, load2, not2 = tail[-4:]
+    if (
+        load1[0] == "load_boolean"
+        and not1[0] == "not_boolean"
+        and load2[0] == "load_boolean"
+        and not2[0] == "not_boolean"
+        and not1[1] == load1[2]
+        and load2[1] == not1[2]
+        and not2[1] == load2[2]
+    ):
+        return 3, [], load1[2]
+    return None
+
+
+def _fold_not(tail) -> Optional[_Rewrite]:
+    """literal v -> p; load_boolean p -> a; not a -> b   =>   literal_boolean (not v) -> b"""
+    if len(tail) < 3:
+        return None
+    lit, load, instr = tail[-3:]
+    if (
+        _is_literal(lit)
+        and load[0] == "load_boolean"
+        and load[1] == lit[2]
+        and instr[0] == "not_boolean"
+        and instr[1] == load[2]
+    ):
+        return 3, [("literal_boolean", not lit[1], instr[2])], instr[2]
+    return None
+
+
+_PEEPHOLE_RULES: Tuple[Callable, ...] = (
+    _fold_constants,
+    _drop_identity,
+    _drop_double_not,
+    _fold_not,
+)
+
+
+def simplify_cfg(instrs: list) -> list:
+    """Cleanup pass over the generated MJIR, applied to each method body:
+    removes unreachable code, jumps to the very next instruction, labels
+    that are no longer branch targets and loads/literals whose result is
+    never used.
+    """
+    code = []
+    method = None
+    for instr in instrs:
+        if instr[0].startswith("define_"):
+            if method is not None:
+                code.extend(_simplify_method(method))
+            method = [instr]
+        elif method is not None and instr[0] != "class" and not instr[0].startswith("field_"):
+            method.append(instr)
+        else:
+            if method is not None:
+                code.extend(_simplify_method(method))
+                method = None
+            code.append(instr)
+    if method is not None:
+        code.extend(_simplify_method(method))
+    return code
+
+
+# Types whose variables always need an alloc (everything else is an object)
+_PRIMITIVE_TYPES = frozenset({"int", "boolean", "int[]", "char[]", "boolean[]"})
+
+
+# Method names, registers and labels repeat all over the IR; interning them
+# at the producer lets later passes compare them by identity.
+def _qname(class_name: str, method_name: str) -> str:
+    return sys.intern(f"@{class_name}.{method_name}")
+
+
+def _reg(name) -> str:
+    return sys.intern(f"%{name}")
+
+
+def _label(label: str) -> str:
+    return sys.intern(f"%{label}")
+
+
+# Temporaries are numbered from 1 again in every function, so the same
+# few names are produced over and over: keep one interned string per number
+_TEMPS: Dict[int, str] = {}
+
+
+def _temp(n: int) -> str:
+    name = _TEMPS.get(n)
+    if name is None:
+        name = _TEMPS[n] = sys.intern(f"%{n}")
+    return name
+
+
+# Marks a name that had no binding before being declared (see bind_name)
+_UNBOUND = object()
+
+# Instructions after which a previously loaded value may be stale (or not
+# reach the next instruction at all), so the block-local value cache is
+# dropped when one of them is emitted.
+_VALUE_BARRIERS = ("store_", "call_", "jump", "cbranch", "return_", "define_")
+
+
 class CodeGenerator(NodeVisitor):
     """
     Node visitor class that creates 3-address encoded instruction sequences
@@ -30,17 +374,24 @@ class CodeGenerator(NodeVisitor):
         self.current_block: Block = None
         self.current_class = None
         self.return_reg = None
-        self.class_fields = {}      # dictionary to store infomation like var from a class, Ex: {'A': ['a','b','c']}
+        self.class_fields = {}      # dictionary to store infomation like var from a class, Ex: {'A': {'@A.a': ('field_int', None)}}
         self.break_target = None    # para loops
         self.global_counter = 0     # 
         self.string_literals = {}   # ensure unique name for global strings
+        self._pending_fields = None # field instructions emitted by the class being visited
+        self._resolved_fields = {}  # class fields as (type, short name, value), Ex: {'A': [('field_int', 'a', None)]}
+        self._init_templates = {}  # class -> per-field opcodes used by NewObject, Ex: {'A': [('load_A', '.a', 'literal_int', 8, 'store_int')]}
 
 
         # version dictionary for temporaries. We use the name as a Key
-        self.versions: Dict[str, int] = {}
+        # Each counter is a one-element list holding the next free number, so
+        # the counter of the current function can be kept in self._cur_counter
+        # and bumped without looking it up in the dictionary again
+        self.versions: Dict[str, List[int]] = {}
         self.fname: str = "_glob_"
-        self.versions[self.fname] = 0 
-        #self.versions: Dict[str, int] = {self.fname: 0}
+        self._glob_counter: List[int] = [0]
+        self.versions[self.fname] = self._glob_counter
+        self._cur_counter: List[int] = self._glob_counter
 
         # The generated code (list of tuples)
         # At the end of visit_program, we call each function definition to emit
@@ -49,13 +400,51 @@ class CodeGenerator(NodeVisitor):
         self.code: List[Tuple[str]] = []
 
         # Used for global declarations & constants (list, strings)
-        self.text: List[Tuple[str]] = []
+        # (a deque, since most globals are prepended to it)
+        self.text: collections.deque = collections.deque()
 
         # Map var names, to control redeclaration in differents scopes
         self.name_map: Dict[str, str] = {}
 
+        # Undo log of name_map bindings: (name, previous register or _UNBOUND).
+        # A scope remembers the log length when it opens and rolls back to it
+        self._name_log: List[Tuple[str, object]] = []
+
+        # One-entry cache of the last name_map lookup: (name, register or
+        # _UNBOUND). Expressions like `x = x + x * x` hit it repeatedly
+        self._last_lookup: Tuple[str, object] = ("", _UNBOUND)
+
+        # Last version used when renaming a shadowed for-loop variable,
+        # Ex: {'i': 3} means 'i.2' and 'i.3' are already taken
+        self._rename_counter: Dict[str, int] = {}
+
+        # Block-local value numbering: (op, *args) -> temp holding the result,
+        # valid for _cache_block up to the instruction index _cache_mark
+        self._value_cache: Dict[tuple, str] = {}
+        self._cache_block = None
+        self._cache_mark = 0
+
+        # Temporaries of the current function released by the peephole
+        # rules, handed out again by new_temp before fresh ones
+        self._free_temps: List[int] = []
+
         # TODO: Complete if needed.
 
+    def _compile_init_template(self, class_name: str) -> List[tuple]:
+        """
+        Precompute, for every initialized field of `class_name`, the opcodes
+        and operands NewObject emits: only the temporaries vary per object.
+        """
+        load_op = _load(class_name)
+        template = []
+        for instr_type, short_name, value in self._resolved_fields[class_name]:
+            if value is not None:
+                field_type = instr_type[6:]     # Ex: 'field_int' -> 'int'
+                template.append(
+                    (load_op, "." + short_name, _mangle("literal", field_type), value, _store(field_type))
+                )
+        return template
+
     def show(self):
         _str = ""
         for _code in self.code:
@@ -66,25 +455,129 @@ class CodeGenerator(NodeVisitor):
         """
         Create a new temporary variable of a given scope (function name).
         """
-        if self.fname not in self.versions:
-            self.versions[self.fname] = 1
-        name = "%" + "%d" % (self.versions[self.fname])
-        #print(f"[DEBUG] new_text → {name}")
-        self.versions[self.fname] += 1
-        return name
+        if self._free_temps:
+            return _temp(self._free_temps.pop())
+        counter = self._cur_counter
+        n = counter[0]
+        counter[0] = n + 1
+        return _temp(n)
+
+    def kill_temp(self, temp: str) -> None:
+        """
+        Hand `temp` back to new_temp once its last use has been emitted.
+        """
+        if not temp[1:].isdigit():
+            return
+        n = int(temp[1:])
+        if n in self._free_temps:
+            return
+        cache = self._value_cache
+        for key in [key for key, value in cache.items() if value == temp]:
+            del cache[key]
+        self._free_temps.append(n)
+
+    def _emit_pure(self, op: str, *args) -> str:
+        """
+        Emit the side-effect free instruction `op args -> temp` and return
+        the temp, reusing the one of an identical instruction already
+        emitted in the current block when nothing in between invalidated it.
+        """
+        cache = self._value_cache
+        instrs = self.current_block.instructions
+        if self.current_block is not self._cache_block:
+            self._cache_block = self.current_block
+            cache.clear()
+        elif cache:
+            for instr in instrs[self._cache_mark:]:
+                if _is_label(instr) or instr[0].startswith(_VALUE_BARRIERS):
+                    cache.clear()
+                    break
+        key = (op,) + args
+        temp = cache.get(key)
+        if temp is None:
+            temp = cache[key] = self.new_temp()
+            instrs.append(key + (temp,))
+        self._cache_mark = len(instrs)
+        return temp
 
     def new_text(self, typename: str) -> str:
         """
         Create a new literal constant on global section (text).
         """
-        if "_glob_" not in self.versions:
-            self.versions["_glob_"] = 0
-        name = "@." + typename + "." + "%d" % (self.versions["_glob_"])
-        
-        #print(f"[DEBUG] new_text → {name}")
+        counter = self._glob_counter
+        n = counter[0]
+        counter[0] = n + 1
+        return sys.intern(f"@.{typename}.{n}")
+
+    def enter_function(self, fname: str) -> None:
+        """
+        Make `fname` the current scope and restart its temporaries at %1.
+        """
+        self.fname = fname
+        self._cur_counter = self.versions[fname] = [1]
+        self._free_temps.clear()
+
+    def _peephole(self, node: Node, *operands: Node, window: int = 4) -> None:
+        """
+        Rewrite the tail of the current block with the peephole rules until
+        none applies, moving `node.gen_loc` to wherever its value ends up.
+        Temporaries no longer defined by any instruction are recycled.
+        """
+        instrs = self.current_block.instructions
+        while True:
+            tail = instrs[-window:]
+            for rule in _PEEPHOLE_RULES:
+                rewrite = rule(tail)
+                if rewrite is not None:
+                    break
+            else:
+                return
+            k, replacement, loc = rewrite
+            kept = {instr[-1] for instr in replacement}
+            kept.add(loc)
+            for instr in instrs[-k:]:
+                if instr[-1] not in kept:
+                    self.kill_temp(instr[-1])
+            instrs[-k:] = replacement
+            self._cache_mark = min(self._cache_mark, len(instrs))
+            node.gen_loc = loc
+            node.gen_is_temp = True
+            for operand in operands:
+                if operand.gen_loc == loc:
+                    node.gen_is_temp = operand.gen_is_temp
+
+    def bind_name(self, name: str, reg: str) -> None:
+        """
+        Map `name` to `reg` in name_map, logging the previous binding.
+        """
+        self._name_log.append((name, self.name_map.get(name, _UNBOUND)))
+        self.name_map[name] = reg
+        self._last_lookup = (name, reg)
 
-        self.versions["_glob_"] += 1
-        return name
+    def unbind_names(self, mark: int) -> None:
+        """
+        Undo every binding made since the log had length `mark`.
+        """
+        log = self._name_log
+        while len(log) > mark:
+            name, reg = log.pop()
+            if reg is _UNBOUND:
+                del self.name_map[name]
+            else:
+                self.name_map[name] = reg
+        self._last_lookup = ("", _UNBOUND)
+
+    def _resolve(self, name: str, default=None):
+        """
+        Register currently bound to `name`, or `default` when unbound.
+        """
+        last = self._last_lookup
+        if last[0] == name:
+            reg = last[1]
+        else:
+            reg = self.name_map.get(name, _UNBOUND)
+            self._last_lookup = (name, reg)
+        return default if reg is _UNBOUND else reg
 
     # You must implement visit_Nodename methods for all of the AST nodes.
     # In your code, you will need to make instructions
@@ -97,36 +590,53 @@ class CodeGenerator(NodeVisitor):
         print(f"\n[DEBUG CodeGen visit_{visit_Name}]:\n", node)
         #print(f"[DEBUG CodeGen visit_{visit_Name}]")
 
+    @staticmethod
     def needs_load(reg: str) -> bool:
-        return '.' in reg or reg.startswith('%this.')
+        """
+        Whether `reg` names a field address (Ex: '%this.x', '%3.@A.x') whose
+        value has to be loaded before it can be used as an operand.
+        """
+        return '.' in reg
 
+    @staticmethod
+    def _decorate(root: Node) -> None:
+        """
+        Give every node of the tree the attributes the visitors read, so
+        they can be tested with `is None` instead of hasattr.
+        """
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            node.gen_loc = None
+            node.gen_is_temp = False
+            node.target_reg = None
+            node.parent = None
+            stack.extend(child for _, child in node.children() if isinstance(child, Node))
 
     def visit_Program(self, node: Program):
-        #self.print_debug(type(node).__name__, node)
-        # First visit all of the Class Declarations
+        self._decorate(node)
+
+        # Visit all of the Class Declarations and, in the same pass, emit
+        # the code stored inside their basic blocks
+        emitted = []
         for class_decl in node.class_decls:
             if class_decl is not None:
                 self.visit(class_decl)
+                block_visitor = EmitBlocks()
+                block_visitor.visit(class_decl.cfg)
+                emitted.extend(block_visitor.code)
 
-        # At the end of codegen, first init the self.code with the list
-        # of global instructions allocated in self.text
-        #self.code = self.text.copy()
-
-        # Now insert global declarations (text section) at the beginning of the final code
-        # instead of replacing self.code!
-        self.code = self.text + self.code
+        # At the end of codegen, insert the global declarations (text section)
+        # at the beginning of the code (class and field declarations already
+        # are in self.code), followed by the emitted methods. Both are
+        # spliced into self.code in place, without intermediate lists
+        self.code.extend(emitted)
+        self.code[:0] = self.text
 
+        # Finally, clean up the obvious inefficiencies left by the emitters
+        self.code = simplify_cfg(self.code)
 
-        # After, visit all the class definitions and emit the
-        # code stored inside basic blocks.
-        for class_decl in node.class_decls:
-            block_visitor = EmitBlocks()
-            block_visitor.visit(class_decl.cfg)
-            for code in block_visitor.code:
-                self.code.append(code)
-                
     def visit_ClassDecl(self, node: ClassDecl):
-        # self.print_debug(type(node).__name__, node)
         # Create a cfg to hold the class context
         node.cfg = BasicBlock(label=None)
 
@@ -139,74 +649,62 @@ class CodeGenerator(NodeVisitor):
         self.code.append(("class", "@" + class_name, extends_name))
 
         #### Copy SuperClass fields
-        self.class_fields[class_name] = []
-
-        # To avoid duplicated field names
-        seen_fields = set()
-
-        # Herda campos da superclasse, mas RENOMEANDO com o prefixo da subclasse
-        if extends_name and extends_name in self.class_fields:
-            for field in self.class_fields[extends_name]:
-                instr_type, field_name, value = field
-                base_class_prefix = f"@{extends_name}."
-                subclass_prefix = f"@{class_name}."
-
-                if field_name.startswith(base_class_prefix):
-                    new_field_name = field_name.replace(base_class_prefix, subclass_prefix)
-                else:
-                    new_field_name = f"@{class_name}.{field_name.split('.')[-1]}"  # fallback
-
-                if new_field_name not in seen_fields:
-                    new_field = (instr_type, new_field_name, value)
-                    self.code.append(new_field)
-                    self.class_fields[class_name].append(new_field)
-                    seen_fields.add(new_field_name)
-
-
-        # Visit all the Field Declarations
+        # Keyed by full field name -> (instr_type, value); the dict keeps the
+        # declaration order and a name already present is never added again
+        fields = self.class_fields[class_name] = {}
+
+        # Herda campos da superclasse, mas RENOMEANDO com o prefixo da subclasse.
+        # The parent's fields are already resolved to (type, short name, value),
+        # so only the new prefix has to be applied
+        subclass_prefix = f"@{class_name}."
+        if extends_name and extends_name in self._resolved_fields:
+            for instr_type, short_name, value in self._resolved_fields[extends_name]:
+                new_field_name = subclass_prefix + short_name
+
+                if new_field_name not in fields:
+                    self.code.append((instr_type, new_field_name, value))
+                    fields[new_field_name] = (instr_type, value)
+
+
+        # Visit all the Field Declarations. visit_VarDecl reports every
+        # field instruction it emits through self._pending_fields
+        self._pending_fields = []
         for field_decl in node.var_decls:
             if field_decl is not None:
-                # save length before generation
-                before = len(self.code)
                 self.visit(field_decl)
 
-                # Add fields to class list
-                for instr in self.code[before:]:
-                    if instr[0].startswith("field_"):
-                        if instr[1] not in seen_fields:
-                            self.class_fields[class_name].append(instr)
-                            seen_fields.add(instr[1])
+        # Add fields to class list
+        for instr_type, field_name, value in self._pending_fields:
+            fields.setdefault(field_name, (instr_type, value))
+        self._pending_fields = None
 
-        # Visit all the Method Declarations
+        # Keep the expanded field list so subclasses don't re-walk the chain
+        self._resolved_fields[class_name] = [
+            (instr_type, field_name[len(subclass_prefix):], value)
+            for field_name, (instr_type, value) in fields.items()
+        ]
+
+        # Visit all the Method Declarations, emitting the code stored inside
+        # their basic blocks as soon as each one is complete
         for method_decl in node.method_decls:
             if method_decl is not None:
                 self.visit(method_decl)
+                block_visitor = EmitBlocks()
+                block_visitor.visit(method_decl.cfg)
+                node.cfg.instructions.extend(block_visitor.code)
+
+                # If -cfg flag is present in command line
+                if self.viewcfg:
+                    method_name = getattr(method_decl, "name", None)
+                    if method_name is not None:
+                        method_name = method_name.name
+                    else:
+                        method_name = "main"
 
-        # Visit all the method definitions and emit the
-        # code stored inside basic blocks.
-        for method_decl in node.method_decls:
-            block_visitor = EmitBlocks()
-            block_visitor.visit(method_decl.cfg)
-            for instruction in block_visitor.code:
-                node.cfg.append(instruction)
-
-        # If -cfg flag is present in command line
-        if self.viewcfg:
-            for method_decl in node.method_decls:
-                method_name = getattr(method_decl, "name", None)
-                if method_name is not None:
-                    method_name = method_name.name
-                else:
-                    method_name = "main"
-
-                dot = CFG(f"@{node.name.name}.{method_name}")
-                dot.view(method_decl.cfg)
-
-
+                    dot = CFG(f"@{node.name.name}.{method_name}")
+                    dot.view(method_decl.cfg)
 
     def visit_VarDecl(self, node: VarDecl):
-        # self.print_debug(type(node).__name__, node)
-
         var_name = node.name.name
 
         # Extract the type
@@ -220,13 +718,13 @@ class CodeGenerator(NodeVisitor):
         else:
             raise Exception(f"Unknown type in VarDecl: {type(node.type)}")
 
-        reg_name = f"%{var_name}"
-        self.name_map[var_name] = reg_name
+        reg_name = _reg(var_name)
+        self.bind_name(var_name, reg_name)
 
         # Variable declared in method scope
         if self.current_block is not None:
             is_new_object = isinstance(node.init, NewObject) if node.init else False
-            is_object_type = var_type not in {"int", "boolean", "int[]", "char[]", "boolean[]"}
+            is_object_type = var_type not in _PRIMITIVE_TYPES
 
             # Special case: list initializer
             if node.init and node.init.__class__.__name__ == "InitList":
@@ -237,21 +735,25 @@ class CodeGenerator(NodeVisitor):
                 # Generate global constant for the list (like @.const_<name>)
                 global_label = f"@.const_{var_name}.{self.global_counter}"
                 self.global_counter += 1
-                self.text.insert(0, (f"global_{var_type}_{list_len}", global_label, node.init.gen_values))
+                self.text.appendleft((f"global_{var_type}_{list_len}", global_label, node.init.gen_values))
                 self.current_block.append((f"store_{var_type}_{list_len}", global_label, reg_name))
 
             # If initialization is a string constant (char[])
             elif isinstance(node.init, Constant) and isinstance(node.init.value, str):
                 raw_str = node.init.value.strip('"')
                 str_len = len(raw_str)
-                label = self.string_literals.setdefault(raw_str, f"@.str.{len(self.string_literals)}")
-                self.text.insert(0, ("global_String", label, raw_str))
+                label = self.string_literals.get(raw_str)
+                if label is None:
+                    # first occurrence: emit the global only once
+                    label = f"@.str.{len(self.string_literals)}"
+                    self.string_literals[raw_str] = label
+                    self.text.appendleft(("global_String", label, raw_str))
                 self.current_block.append((f"alloc_char[]_{str_len}", reg_name))
                 self.current_block.append(("store_char[]", label, reg_name))
 
             # Object created with "new" (do not allocate)
             elif not (is_new_object and is_object_type):
-                self.current_block.append((f"alloc_{var_type}", reg_name))
+                self.current_block.append((_alloc(var_type), reg_name))
 
             # Regular initialization
             if node.init and not node.init.__class__.__name__ == "InitList":
@@ -261,9 +763,9 @@ class CodeGenerator(NodeVisitor):
                     if isinstance(node.init, FieldAccess) and isinstance(node.init.object, This):
                         field_name = node.init.field_name.name
                         field_ref = f"%this.{field_name}"
-                        self.current_block.append((f"store_{var_type}", field_ref, reg_name))
+                        self.current_block.append((_store(var_type), field_ref, reg_name))
                     else:
-                        self.current_block.append((f"store_{var_type}", node.init.gen_loc, reg_name))
+                        self.current_block.append((_store(var_type), node.init.gen_loc, reg_name))
 
         # Variable declared in class scope (fields)
         else:
@@ -271,9 +773,11 @@ class CodeGenerator(NodeVisitor):
             if node.init is not None:
                 self.visit(node.init)
                 value = node.init.gen_loc
-                self.code.append((f"field_{var_type}", field_name, value))
             else:
-                self.code.append((f"field_{var_type}", field_name, None))
+                value = None
+            instr = (_field(var_type), field_name, value)
+            self.code.append(instr)
+            self._pending_fields.append(instr)
  
     def visit_MethodDecl(self, node: MethodDecl):
         method_name = node.name.name
@@ -281,8 +785,7 @@ class CodeGenerator(NodeVisitor):
         return_type = node.type.typename if hasattr(node.type, 'typename') else node.type.name
 
         # Build full method name
-        self.fname = f"@{class_name}.{method_name}"
-        self.versions[self.fname] = 1
+        self.enter_function(_qname(class_name, method_name))
 
         # Create blocks
         node.cfg = BasicBlock(label=f"{method_name}.entry")
@@ -292,16 +795,19 @@ class CodeGenerator(NodeVisitor):
         # Aux maps
         self.param_map = {}
         self.name_map = {}
+        self._name_log = []
+        self._last_lookup = ("", _UNBOUND)
+        self._rename_counter = {}
 
         # Build parameter list with fixed names: %1, %2, ...
         param_list = []
         for i, param in enumerate(node.param_list.params):
             ptype = param.type.name if hasattr(param.type, 'name') else param.type.typename
             pname = param.name.name
-            reg = f"%{i + 1}"
+            reg = _reg(i + 1)
             param_list.append((ptype, reg))
             self.param_map[pname] = reg
-            self.name_map[pname] = reg
+            self.bind_name(pname, reg)
 
         # Set fixed return register
         if return_type != "void":
@@ -309,35 +815,38 @@ class CodeGenerator(NodeVisitor):
         else:
             self.return_reg = None
 
-        # Fix self.versions[self.fname] to match param count (manually done above)
-        self.versions[self.fname] = len(param_list) + (2 if return_type != "void" else 1)
+        # Fix the temporaries counter to match param count (manually done above)
+        self._cur_counter[0] = len(param_list) + (2 if return_type != "void" else 1)
         
         # Emit define_<type>
-        self.current_block.append((f"define_{return_type}", self.fname, param_list))
+        self.current_block.append((_mangle("define", return_type), self.fname, param_list))
         self.current_block.append(("entry:",))
 
         # Allocate return register if needed
         if return_type != "void":
             self.return_reg = self.new_temp()  # instead of hardcoding %2
-            self.current_block.append((f"alloc_{return_type}", self.return_reg))
+            self.current_block.append((_alloc(return_type), self.return_reg))
         else:
             self.return_reg = None
 
         # Allocate and store params into local vars like %x, %y, etc.
+        # (collect the pairs first and emit them with a single extend)
+        buf = []
         for i, param in enumerate(node.param_list.params):
             ptype = param.type.name if hasattr(param.type, 'name') else param.type.typename
             pname = param.name.name
-            reg_local = f"%{pname}"  # fixed name like %x
-            self.name_map[pname] = reg_local
-            self.current_block.append((f"alloc_{ptype}", reg_local))
-            self.current_block.append((f"store_{ptype}", f"%{i + 1}", reg_local))
+            reg_local = _reg(pname)  # fixed name like %x
+            self.bind_name(pname, reg_local)
+            buf.append((_alloc(ptype), reg_local))
+            buf.append((_store(ptype), _reg(i + 1), reg_local))
+        self.current_block.instructions.extend(buf)
 
         # Visit method body
         self.visit(node.body)
 
         # Ensure the block jumps to exit if there's no explicit return
         if not self.current_block.instructions or self.current_block.instructions[-1][0] != "jump":
-            self.current_block.append(("jump", f"%{self.exit_block.label}"))
+            self.current_block.append(("jump", _label(self.exit_block.label)))
         self.current_block.next_block = self.exit_block
 
         # Exit block
@@ -346,26 +855,24 @@ class CodeGenerator(NodeVisitor):
 
         if self.return_reg:
             temp = self.new_temp()
-            self.current_block.append((f"load_{return_type}", self.return_reg, temp))
-            self.current_block.append((f"return_{return_type}", temp))
+            self.current_block.append((_load(return_type), self.return_reg, temp))
+            self.current_block.append((_mangle("return", return_type), temp))
         else:
             self.current_block.append(("return_void",))
 
         self.current_block = None
 
     def visit_MainMethodDecl(self, node: MainMethodDecl):
-        # self.print_debug(type(node).__name__, node)
-
         node.cfg = BasicBlock(label=f"main.entry")
         self.current_block = node.cfg
 
         # Define the full method name
         method_name = "main"
         class_name = self.current_class
-        self.fname = f"@{class_name}.{method_name}"
-        self.versions[self.fname] = 1
+        self.enter_function(_qname(class_name, method_name))
 
         self.exit_block = BasicBlock(label="exit")  # save exit block for later use
+        self._rename_counter = {}
 
         # Generate the "define" instruction for main
         param_list = []
@@ -381,7 +888,7 @@ class CodeGenerator(NodeVisitor):
 
         # Add jump to exit if current block isn't already the exit block
         if self.current_block.label != self.exit_block.label:
-            self.current_block.append(("jump", f"%{self.exit_block.label}"))
+            self.current_block.append(("jump", _label(self.exit_block.label)))
             self.current_block.next_block = self.exit_block
 
         # Finalize method with return_void
@@ -391,8 +898,7 @@ class CodeGenerator(NodeVisitor):
         self.current_block = self.exit_block
 
     def visit_ParamList(self, node: ParamList):
-        # self.print_debug(type(node).__name__, node)
-
+        buf = []
         for params in node.params:
             var_type = params.type.typename if hasattr(params.type, 'typename') else params.type.name
             var_name = params.name.name
@@ -401,12 +907,12 @@ class CodeGenerator(NodeVisitor):
             # Recover the temporary register with the param name
             temp = self.param_map[var_name]
 
-            self.current_block.append((f"alloc_{var_type}", reg_name))
+            buf.append((_alloc(var_type), reg_name))
             # Store the param value in the allocated space
-            self.current_block.append((f"store_{var_type}", temp, reg_name))
+            buf.append((_store(var_type), temp, reg_name))
+        self.current_block.instructions.extend(buf)
 
     def visit_ParamDecl(self, node: ParamDecl):
-        # self.print_debug(type(node).__name__, node)
         # Map the parameter name to the actual register
         param_name = node.name.name
         reg = self.param_map.get(param_name)
@@ -416,18 +922,16 @@ class CodeGenerator(NodeVisitor):
 
         var_type = node.type.name if hasattr(node.type, 'name') else node.type.typename
 
-        self.name_map[param_name] = reg
-        self.current_block.append((f"alloc_{var_type}", reg))
-        self.current_block.append((f"store_{var_type}", f"%{param_name}", reg))
+        self.bind_name(param_name, reg)
+        self.current_block.append((_alloc(var_type), reg))
+        self.current_block.append((_store(var_type), f"%{param_name}", reg))
         
     def visit_Compound(self, node: Compound):
-        #self.print_debug(type(node).__name__, node)
         # Visit the block items
         for statement in node.statements:
             self.visit(statement)
 
     def visit_If(self, node: If):
-        #self.print_debug(type(node).__name__, node)
         # Visit cond
         self.visit(node.cond)
         cond_loc = node.cond.gen_loc
@@ -442,13 +946,13 @@ class CodeGenerator(NodeVisitor):
         end_block = BasicBlock(label="if.end")
 
         # Make sure that the value is a bool, not a common var
-        if cond_loc.startswith('%') and not cond_loc[1:].isdigit():
+        if not node.cond.gen_is_temp:
             temp = self.new_temp()
             self.current_block.append(("load_boolean", cond_loc, temp))
             cond_loc = temp
 
         # Create a conditional jump
-        self.current_block.append(("cbranch", cond_loc, f"%{then_block.label}", f"%{else_block.label}"))
+        self.current_block.append(("cbranch", cond_loc, _label(then_block.label), _label(else_block.label)))
         self.current_block.next_block = then_block
 
         # THEN BLOCK(if true)
@@ -458,7 +962,7 @@ class CodeGenerator(NodeVisitor):
         
         #if there is no instructions or a jump instruction - this prevent duplicates jump
         if not self.current_block.instructions or self.current_block.instructions[-1][0] != "jump":
-            self.current_block.append(("jump", f"%{end_block.label}"))
+            self.current_block.append(("jump", _label(end_block.label)))
         
         self.current_block.next_block = else_block
 
@@ -469,7 +973,7 @@ class CodeGenerator(NodeVisitor):
         if node.iffalse:
             self.visit(node.iffalse)
 
-        self.current_block.append(("jump", f"%{end_block.label}"))
+        self.current_block.append(("jump", _label(end_block.label)))
         self.current_block.next_block = end_block
 
         # END BLOCK
@@ -477,8 +981,6 @@ class CodeGenerator(NodeVisitor):
         self.current_block.append((f"{end_block.label}:",))
 
     def visit_While(self, node: While):
-        # self.print_debug(type(node).__name__, node)
-
         # Generate a unique identifier
         while_id = self.new_temp()[1:]  # Remove '%' to use in labels
 
@@ -488,7 +990,7 @@ class CodeGenerator(NodeVisitor):
         end_block = BasicBlock(label=f"while{while_id}.end")
         
         # Jump straight to condition check
-        self.current_block.append(("jump", f"%{cond_block.label}"))
+        self.current_block.append(("jump", _label(cond_block.label)))
         self.current_block.next_block = cond_block
 
         # ----- while.cond -----
@@ -501,12 +1003,12 @@ class CodeGenerator(NodeVisitor):
             raise Exception(f"[CodeGen] While: condition has no gen_loc: {node.cond}")
 
         # Ensure we're using a boolean value (e.g., may be a variable that needs loading)
-        if cond_loc.startswith('%') and not cond_loc[1:].isdigit():
+        if not node.cond.gen_is_temp:
             temp = self.new_temp()
             self.current_block.append(("load_boolean", cond_loc, temp))
             cond_loc = temp
 
-        self.current_block.append(("cbranch", cond_loc, f"%{body_block.label}", f"%{end_block.label}"))
+        self.current_block.append(("cbranch", cond_loc, _label(body_block.label), _label(end_block.label)))
         self.current_block.next_block = body_block
 
         # ----- while.body -----
@@ -521,7 +1023,7 @@ class CodeGenerator(NodeVisitor):
 
         # Make sure to jump back to the condition after the body
         if not self.current_block.instructions or self.current_block.instructions[-1][0] != "jump":
-            self.current_block.append(("jump", f"%{cond_block.label}"))
+            self.current_block.append(("jump", _label(cond_block.label)))
 
         self.current_block.next_block = end_block
         self.break_target = old_break_target
@@ -531,31 +1033,31 @@ class CodeGenerator(NodeVisitor):
         self.current_block.append((end_block.label + ":",))
 
     def visit_For(self, node: For):
-        # self.print_debug(type(node).__name__, node)
-
         # Create labeled blocks
         cond_block = BasicBlock(label="for.cond")
         body_block = BasicBlock(label="for.body")
         inc_block = BasicBlock(label="for.inc")
         end_block = BasicBlock(label="for.end")
 
-        # Make a copy of current name map (in case of redeclaration)
-        old_name_map = self.name_map.copy()
+        # Remember where this scope starts in the name log (in case of redeclaration)
+        name_mark = len(self._name_log)
+        # Rename counters touched by this loop, restored at the end
+        old_counters = {}
 
         # If init is DeclList, rename variables with unique temporaries
         # e.g., for (int i = 0; ...) we may need to rename i
         if isinstance(node.init, DeclList):
             for decl in node.init.decls:
                 var_name = decl.name.name
-                if var_name in self.name_map:
-                    # Generate a new unique name
-                    version = 2
+                if self._resolve(var_name) is not None:
+                    # Generate a new unique name like %i, %i.2, %i.3
+                    version = self._rename_counter.get(var_name, 1)
+                    old_counters.setdefault(var_name, version)
+                    version += 1
+                    self._rename_counter[var_name] = version
                     new_name = f"{var_name}.{version}"
-                    while new_name in self.name_map.values():  # Ensure uniqueness like %i, %i.1, %i.2
-                        version += 1
-                        new_name = f"{var_name}.{version}"
 
-                    self.name_map[var_name] = new_name
+                    self.bind_name(var_name, new_name)
                     decl.name.name = new_name
                 
                 # Visit the declaration using the new name
@@ -564,7 +1066,7 @@ class CodeGenerator(NodeVisitor):
             self.visit(node.init)
 
         # Jump straight to condition check
-        self.current_block.append(("jump", f"%{cond_block.label}"))
+        self.current_block.append(("jump", _label(cond_block.label)))
         self.current_block.next_block = cond_block
 
         # ----- for.cond -----
@@ -572,7 +1074,7 @@ class CodeGenerator(NodeVisitor):
         self.current_block.append((cond_block.label + ":",))
         self.visit(node.cond)
         cond_loc = node.cond.gen_loc
-        self.current_block.append(("cbranch", cond_loc, f"%{body_block.label}", f"%{end_block.label}"))
+        self.current_block.append(("cbranch", cond_loc, _label(body_block.label), _label(end_block.label)))
         self.current_block.next_block = body_block
 
         # ----- for.body -----
@@ -581,14 +1083,14 @@ class CodeGenerator(NodeVisitor):
         self.current_block = body_block
         self.current_block.append((body_block.label + ":",))
         self.visit(node.body)
-        self.current_block.append(("jump", f"%{inc_block.label}"))
+        self.current_block.append(("jump", _label(inc_block.label)))
         self.current_block.next_block = inc_block
 
         # ----- for.inc -----
         self.current_block = inc_block
         self.current_block.append((inc_block.label + ":",))
         self.visit(node.next)
-        self.current_block.append(("jump", f"%{cond_block.label}"))
+        self.current_block.append(("jump", _label(cond_block.label)))
         self.current_block.next_block = end_block
 
         # ----- for.end -----
@@ -599,61 +1101,53 @@ class CodeGenerator(NodeVisitor):
         self.break_target = None
 
         # Restore previous name mapping
-        self.name_map = old_name_map
+        self.unbind_names(name_mark)
+        self._rename_counter.update(old_counters)
 
     def visit_DeclList(self, node: DeclList):
-        #self.print_debug(type(node).__name__, node)
         for decl in node.decls:
             self.visit(decl)
 
     def visit_Print(self, node: Print):
-        # self.print_debug(type(node).__name__, node)
+        # A single expression and an ExprList are printed the same way
+        exprs = node.expr.exprs if isinstance(node.expr, ExprList) else (node.expr,)
 
-        if isinstance(node.expr, ExprList):
-            for expr in node.expr.exprs:
-                # print(expr)
-                self.visit(expr)
-                expr_loc = expr.gen_loc
-
-                if not hasattr(expr, "type"):
-                    raise Exception(f"[CodeGen] Print: expression {expr} has no 'type' attribute.")
-
-                expr_type = expr.type.typename
-
-                # Se for int, e expr_loc parece um endereço (temporário), faça load_int antes
-                if expr_type == "int" and expr_loc.startswith('%'):
-                    temp = self.new_temp()
-                    self.current_block.append(("load_int", expr_loc, temp))
-                    expr_loc = temp
+        for expr in exprs:
+            self.visit(expr)
+            expr_loc = expr.gen_loc
 
-                self.current_block.append((f"print_{expr_type}", expr_loc))
-        else:
-            self.visit(node.expr)
-            expr_loc = node.expr.gen_loc
+            if not hasattr(expr, "type"):
+                raise Exception(f"[CodeGen] Print: expression {expr} has no 'type' attribute.")
 
-            if not hasattr(node.expr, "type"):
-                raise Exception(f"[CodeGen] Print: expression {node.expr} has no 'type' attribute.")
+            expr_type = expr.type.typename
 
-            expr_type = node.expr.type.typename
-            if expr_type == "int" and expr_loc.startswith('%'):
+            # Se for int e expr_loc for um endereço (não temporário), faça load_int antes
+            if expr_type == "int" and expr_loc[:1] == '%' and not expr.gen_is_temp:
                 temp = self.new_temp()
                 self.current_block.append(("load_int", expr_loc, temp))
                 expr_loc = temp
-            self.current_block.append((f"print_{expr_type}", expr_loc))
 
-    def visit_Assert(self, node: Assert):
-        # self.print_debug(type(node).__name__, node)
+            self.current_block.append((_print(expr_type), expr_loc))
 
+    def visit_Assert(self, node: Assert):
         str_label = self.new_text("str")
-        self.text.insert(0, ("global_String", str_label, f"assertion_fail on {str(node.expr.lvalue.coord)[2:]}"))
+        # a binary condition is reported at its left operand, as before
+        coord = getattr(node.expr, "lvalue", node.expr).coord
+        self.text.appendleft(("global_String", str_label, f"assertion_fail on {str(coord)[2:]}"))
 
         # Visit the assert expression (e.g., y == 3)
         self.visit(node.expr)
         cond = node.expr.gen_loc  # e.g., %t3
 
-        if not hasattr(node.expr, "gen_loc") or node.expr.gen_loc is None:
+        if node.expr.gen_loc is None:
             raise Exception(f"[CodeGen] Assert: expression has no gen_loc: {node.expr}")
 
+        # Same as If/While: a field address must be loaded before branching
+        if not node.expr.gen_is_temp:
+            temp = self.new_temp()
+            self.current_block.append(("load_boolean", cond, temp))
+            cond = temp
+
         # Create labels for the true and false branches
         true_block = BasicBlock(label="assert.true")
         false_block = BasicBlock(label="assert.false")
@@ -662,14 +1156,14 @@ class CodeGenerator(NodeVisitor):
         exit_block = self.exit_block
 
         # Generate the conditional branch instruction
-        self.current_block.append(("cbranch", cond, f"%{true_block.label}", f"%{false_block.label}"))
+        self.current_block.append(("cbranch", cond, _label(true_block.label), _label(false_block.label)))
         self.current_block.next_block = false_block  # start of the false branch
 
         # ASSERT FALSE
         self.current_block = false_block
         self.current_block.append((false_block.label + ":",))
         self.current_block.append(("print_string", str_label))
-        self.current_block.append(("jump", f"%{exit_block.label}"))
+        self.current_block.append(("jump", _label(exit_block.label)))
         self.current_block.next_block = true_block  # next branch
 
         # ASSERT TRUE
@@ -682,18 +1176,15 @@ class CodeGenerator(NodeVisitor):
         # self.current_block = exit_block
 
     def visit_Break(self, node: Break):
-        # self.print_debug(type(node).__name__, node)
-
         # Jump to the end of the closest loop
-        self.current_block.append(("jump", f"%{self.break_target.label}"))
+        self.current_block.append(("jump", _label(self.break_target.label)))
 
     def visit_Return(self, node: Return):
-        #self.print_debug(type(node).__name__, node)
         # Se há expressão (return com valor)
         if node.expr is not None:
             self.visit(node.expr)
 
-            if not hasattr(node.expr, "gen_loc") or node.expr.gen_loc is None:
+            if node.expr.gen_loc is None:
                 raise Exception(f"[CodeGen] Return: expressão sem gen_loc: {node.expr}")
 
             value = node.expr.gen_loc
@@ -707,17 +1198,54 @@ class CodeGenerator(NodeVisitor):
                 raise Exception("[CodeGen] Return: return_reg não definido para método com retorno.")
 
             # Armazena no registrador de retorno, depois salta para exit
-            self.current_block.append((f"store_{return_type}", value, self.return_reg))
-            self.current_block.append(("jump", f"%{self.exit_block.label}"))
+            self.current_block.append((_store(return_type), value, self.return_reg))
+            self.current_block.append(("jump", _label(self.exit_block.label)))
 
         else:
             # return sem valor → void
             self.current_block.append(("return_void",))
 
+    def _assign_id(self, lvalue: ID, value: str, value_type: str) -> None:
+        var_name = lvalue.name
+        raw_name = self._resolve(var_name, var_name)
+        reg_name = raw_name if raw_name.startswith('%') else f"%{raw_name}"
+        self.current_block.append((_store(value_type), value, reg_name))
+
+    # Works for both this.field and obj.field
+    def _assign_field(self, lvalue: FieldAccess, value: str, value_type: str) -> None:
+        self.visit(lvalue.object)
+        obj_loc = lvalue.object.gen_loc
+        field_name = lvalue.field_name.name
+
+        # Descobrir o nome da classe do objeto para construir nome completo do campo
+        if hasattr(lvalue.object, "type") and hasattr(lvalue.object.type, "name"):
+            class_name = lvalue.object.type.name
+            full_field_name = f"{obj_loc}.@{class_name}.{field_name}"
+        else:
+            full_field_name = f"{obj_loc}.{field_name}"
+
+        addr_temp = self.new_temp()
+        self.current_block.append(("load_addr", full_field_name, addr_temp))
+        self.current_block.append((_store(value_type), value, addr_temp))
+
+    def _assign_array(self, lvalue: ArrayRef, value: str, value_type: str) -> None:
+        self.visit(lvalue.name)
+        self.visit(lvalue.subscript)
+        array_loc = lvalue.name.gen_loc
+        index_loc = lvalue.subscript.gen_loc
+        self.current_block.append((_mangle(_store(value_type), "array"), value, array_loc, index_loc))
+
+    # Store emitter for each kind of lvalue, picked by its exact node class
+    _ASSIGN = {
+        ID: _assign_id,
+        FieldAccess: _assign_field,
+        ArrayRef: _assign_array,
+    }
+
     def visit_Assignment(self, node: Assignment):
         # Visit the right-hand side (value)
         self.visit(node.rvalue)
-        if not hasattr(node.rvalue, "gen_loc") or node.rvalue.gen_loc is None:
+        if node.rvalue.gen_loc is None:
             raise Exception(f"[CodeGen] Assignment: rvalue has no gen_loc: {node.rvalue}")
 
         value = node.rvalue.gen_loc
@@ -725,7 +1253,7 @@ class CodeGenerator(NodeVisitor):
         # Suggest target register if it's a NewObject assigned to an ID
         if isinstance(node.rvalue, NewObject) and isinstance(node.lvalue, ID):
             var_name = node.lvalue.name
-            reg_name = self.name_map.get(var_name, f"%{var_name}")
+            reg_name = self._resolve(var_name, f"%{var_name}")
             node.rvalue.target_reg = reg_name
 
         # Get the type
@@ -739,67 +1267,32 @@ class CodeGenerator(NodeVisitor):
         # If value is an address (e.g., FieldAccess or contains a '.')
         if isinstance(node.rvalue, FieldAccess) or (isinstance(value, str) and '.' in value):
             temp = self.new_temp()
-            self.current_block.append((f"load_{value_type}", value, temp))
+            self.current_block.append((_load(value_type), value, temp))
             value = temp
 
-        # Lvalue: local variable
-        if isinstance(node.lvalue, ID):
-            var_name = node.lvalue.name
-            raw_name = self.name_map.get(var_name, var_name)
-            reg_name = raw_name if raw_name.startswith('%') else f"%{raw_name}"
-            self.current_block.append((f"store_{value_type}", value, reg_name))
-            node.gen_loc = reg_name
-
-        #elif isinstance(node.lvalue, FieldAccess):
-        #    if isinstance(node.lvalue.object, This):
-        #        field_name = node.lvalue.field_name.name
-        #        target = f"%this.{field_name}"
-        #        self.current_block.append((f"store_{value_type}", value, target))
-        #    else:
-        #        self.visit(node.lvalue.object)
-        #        obj_loc = node.lvalue.object.gen_loc
-        #        field_name = node.lvalue.field_name.name
-        #        addr_temp = self.new_temp()
-        #        self.current_block.append(("load_addr", f"{obj_loc}.{field_name}", addr_temp))
-        #        self.current_block.append((f"store_{value_type}", value, addr_temp))
-
-        # Lvalue: field access (works for both this.field and obj.field)
-        elif isinstance(node.lvalue, FieldAccess):
-            self.visit(node.lvalue.object)
-            obj_loc = node.lvalue.object.gen_loc
-            field_name = node.lvalue.field_name.name
-
-            # Descobrir o nome da classe do objeto para construir nome completo do campo
-            if hasattr(node.lvalue.object, "type") and hasattr(node.lvalue.object.type, "name"):
-                class_name = node.lvalue.object.type.name
-                full_field_name = f"{obj_loc}.@{class_name}.{field_name}"
-            else:
-                full_field_name = f"{obj_loc}.{field_name}"
-
-            addr_temp = self.new_temp()
-            self.current_block.append(("load_addr", full_field_name, addr_temp))
-            self.current_block.append((f"store_{value_type}", value, addr_temp))
-
-        
-
-        # Lvalue: array access
-        elif isinstance(node.lvalue, ArrayRef):
-            self.visit(node.lvalue.name)
-            self.visit(node.lvalue.subscript)
-            array_loc = node.lvalue.name.gen_loc
-            index_loc = node.lvalue.subscript.gen_loc
-            self.current_block.append((f"store_{value_type}_array", value, array_loc, index_loc))
-
-        else:
+        # Lvalue: local variable, field access or array access
+        assign = self._ASSIGN.get(type(node.lvalue))
+        if assign is None:
             raise Exception(f"[CodeGen] Assignment: unsupported lvalue type: {type(node.lvalue).__name__}")
+        assign(self, node.lvalue, value, value_type)
 
         node.gen_loc = None  # assignments do not produce a value
+        node.gen_is_temp = False
 
     def visit_BinaryOp(self, node: BinaryOp):
         # Set parent relationships (needed for == with *)
         node.lvalue.parent = node
         node.rvalue.parent = node
 
+        # Two constant operands: emit the result as a single literal
+        if isinstance(node.lvalue, Constant) and isinstance(node.rvalue, Constant):
+            value = _fold(_BIN_OP.get(node.op), node.lvalue.value, node.rvalue.value)
+            if value is not None:
+                node.gen_loc = self.new_temp()
+                node.gen_is_temp = True
+                self.current_block.append((_literal_op(value), value, node.gen_loc))
+                return
+
         # Visit operands in correct order
         if node.op == "==":
             self.visit(node.rvalue)
@@ -809,66 +1302,52 @@ class CodeGenerator(NodeVisitor):
             self.visit(node.rvalue)
 
         # Ensure both sides have a value
-        if not hasattr(node.lvalue, "gen_loc") or node.lvalue.gen_loc is None:
+        if node.lvalue.gen_loc is None:
             raise Exception(f"[CodeGen] BinaryOp: lvalue has no gen_loc.")
-        if not hasattr(node.rvalue, "gen_loc") or node.rvalue.gen_loc is None:
+        if node.rvalue.gen_loc is None:
             raise Exception(f"[CodeGen] BinaryOp: rvalue has no gen_loc.")
 
         left = node.lvalue.gen_loc
         right = node.rvalue.gen_loc
 
-        # Helper function to decide if load is needed
-        def needs_load(reg):
-            return '.' in reg or reg.startswith('%this.')
-
         # Load values if needed
-        if needs_load(left):
-            temp_left = self.new_temp()
-            self.current_block.append((f"load_{node.lvalue.type.typename}", left, temp_left))
-            left = temp_left
+        if self.needs_load(left):
+            left = self._emit_pure(_load(node.lvalue.type.typename), left)
 
-        if needs_load(right):
-            temp_right = self.new_temp()
-            self.current_block.append((f"load_{node.rvalue.type.typename}", right, temp_right))
-            right = temp_right
+        if self.needs_load(right):
+            right = self._emit_pure(_load(node.rvalue.type.typename), right)
 
         result = self.new_temp()
 
-        op_map = {
-            "+":  "add_int",
-            "-":  "sub_int",
-            "*":  "mul_int",
-            "/":  "div_int",
-            "%":  "mod_int",
-            "==": "eq_int",
-            "!=": "ne_int",
-            "<":  "lt_int",
-            "<=": "le_int",
-            ">":  "gt_int",
-            ">=": "ge_int",
-            "&&": "and_boolean",
-            "||": "or_boolean",
-        }
-
-        instr = op_map.get(node.op)
+        instr = _BIN_OP.get(node.op)
         if instr is None:
             raise Exception(f"[CodeGen] Unsupported binary operator: {node.op}")
 
         self.current_block.append((instr, left, right, result))
 
         # Ensure test compatibility: if child of == and this is *, load result
-        if node.op == "*" and hasattr(node, "parent") and isinstance(node.parent, BinaryOp) and node.parent.op == "==":
+        if node.op == "*" and isinstance(node.parent, BinaryOp) and node.parent.op == "==":
             loaded = self.new_temp()
-            self.current_block.append((f"load_{node.type.typename}", result, loaded))
+            self.current_block.append((_load(node.type.typename), result, loaded))
             node.gen_loc = loaded
+            node.gen_is_temp = True
         else:
             node.gen_loc = result
+            node.gen_is_temp = True
+            self._peephole(node, node.lvalue, node.rvalue)
 
     def visit_UnaryOp(self, node: UnaryOp):
-        # self.print_debug(type(node).__name__, node)
+        # Constant operand: emit the negated value as a single literal
+        if node.op in ("!", "-") and isinstance(node.expr, Constant) and isinstance(node.expr.value, int):
+            value = node.expr.value
+            value = (not value) if node.op == "!" else -value
+            node.gen_loc = self.new_temp()
+            node.gen_is_temp = True
+            self.current_block.append((_literal_op(value), value, node.gen_loc))
+            return
 
         self.visit(node.expr)
-        if not hasattr(node.expr, "gen_loc") or node.expr.gen_loc is None:
+        if node.expr.gen_loc is None:
             raise Exception(f"[CodeGen] UnaryOp: expr has no gen_loc.")
 
         operand = node.expr.gen_loc
@@ -885,22 +1364,22 @@ class CodeGenerator(NodeVisitor):
             self.current_block.append(("literal_int", 0, zero))
             result = self.new_temp()
             self.current_block.append(("sub_int", zero, operand, result))
+            self.kill_temp(zero)
 
         else:
             raise Exception(f"[CodeGen] Unsupported unary operator: {node.op}")
 
         node.gen_loc = result
+        node.gen_is_temp = True
+        self._peephole(node, node.expr)
 
     def visit_ArrayRef(self, node: ArrayRef):
-        # print debug info if needed
-        print(f"[DEBUG ArrayRef] type={elem_type} base={base_type} array={array_loc} index={index_loc}")
-
         self.visit(node.name)
         self.visit(node.subscript)
 
-        if not hasattr(node.name, "gen_loc") or node.name.gen_loc is None:
+        if node.name.gen_loc is None:
             raise Exception("[CodeGen] ArrayRef.name has no gen_loc.")
-        if not hasattr(node.subscript, "gen_loc") or node.subscript.gen_loc is None:
+        if node.subscript.gen_loc is None:
             raise Exception("[CodeGen] ArrayRef.subscript has no gen_loc.")
         if not hasattr(node.name, "type") or node.name.type is None:
             raise Exception("[CodeGen] ArrayRef.name has no type.")
@@ -913,19 +1392,19 @@ class CodeGenerator(NodeVisitor):
         result = self.new_temp()
 
         # First, calculate address of the array element
-        self.current_block.append((f"elem_{elem_type}", array_loc, index_loc, addr))
+        self.current_block.append((_mangle("elem", elem_type), array_loc, index_loc, addr))
 
         # Remove [] from type to generate correct load instruction
-        base_type = elem_type.replace("[]", "")
-        self.current_block.append((f"load_{base_type}", addr, result))
+        base_type = _strip_array(elem_type)
+        self.current_block.append((_load(base_type), addr, result))
 
         node.gen_loc = result
+        node.gen_is_temp = True
 
     def visit_FieldAccess(self, node: FieldAccess):
-        #self.print_debug(type(node).__name__, node)
         self.visit(node.object)
 
-        if not hasattr(node.object, "gen_loc") or node.object.gen_loc is None:
+        if node.object.gen_loc is None:
             raise Exception("[CodeGen] FieldAccess: object has no gen_loc.")
 
         obj_loc = node.object.gen_loc
@@ -951,23 +1430,20 @@ class CodeGenerator(NodeVisitor):
             field_full_name = f"{obj_loc}.{field_name}"
             
         # If it's obj.field, generate load_addr
-        addr_temp = self.new_temp()
-        self.current_block.append(("load_addr", field_full_name, addr_temp))
-        node.gen_loc = addr_temp
+        node.gen_loc = self._emit_pure("load_addr", sys.intern(field_full_name))
+        node.gen_is_temp = False
 
     def visit_MethodCall(self, node: MethodCall):
-        #self.print_debug(type(node).__name__, node)
-
         # Visita o objeto no qual o método é chamado (ex: 'age' em 'age.set_age')
         #self.visit(node.object)
 
         # Se receiver for ID (ex: obj.foo()), não faz load, usa nome diretamente
         if isinstance(node.object, ID):
             recv_name = node.object.name
-            recv_loc = self.name_map.get(recv_name, f"%{recv_name}")
+            recv_loc = self._resolve(recv_name, f"%{recv_name}")
         else:
             self.visit(node.object)
-            if not hasattr(node.object, "gen_loc") or node.object.gen_loc is None:
+            if node.object.gen_loc is None:
                 raise Exception("[CodeGen] MethodCall: objeto sem gen_loc.")
             recv_loc = node.object.gen_loc
             
@@ -983,7 +1459,7 @@ class CodeGenerator(NodeVisitor):
                 self.visit(arg)
                 #args.append((arg.gen_loc, arg.type.typename))
                 arg_type = getattr(arg, 'type', None)
-                if not hasattr(arg, 'gen_loc') or arg.gen_loc is None:
+                if arg.gen_loc is None:
                     raise Exception(f"[CodeGen] Argumento da chamada de método sem gen_loc: {arg}")
                 if not hasattr(arg, 'type') or arg.type is None:
                     raise Exception(f"[CodeGen] Argumento da chamada de método sem tipo: {arg}")
@@ -1000,7 +1476,7 @@ class CodeGenerator(NodeVisitor):
 
         # Emite as instruções param_<tipo>
         for arg_loc, arg_type in args:
-            self.current_block.append((f"param_{arg_type}", arg_loc))
+            self.current_block.append((_mangle("param", arg_type), arg_loc))
 
         # Gera o rótulo da chamada do método
         #call_label = f"{recv_loc}.{node.method_name.name}"
@@ -1008,40 +1484,41 @@ class CodeGenerator(NodeVisitor):
         # Aloca registrador temporário para o resultado (caso não seja void)
         if node.type.typename != "void":
             node.gen_loc = self.new_temp()
+            node.gen_is_temp = True
             self.current_block.append(("call_int", call_label, node.gen_loc))
         else:
             dummy_target = self.new_temp()
             self.current_block.append(("call_void", call_label, dummy_target))
 
     def visit_Length(self, node: Length):
-        #self.print_debug(type(node).__name__, node)
         # Visit the expression to set its gen location
         self.visit(node.expr)
-        if not hasattr(node.expr, "gen_loc") or node.expr.gen_loc is None:
+        if node.expr.gen_loc is None:
             raise Exception("[CodeGen] Length: expressão sem gen_loc.")
         
         # Alloc a register to store the length
         node.gen_loc = self.new_temp()
+        node.gen_is_temp = True
         # gen the length instruction
         length_inst = ("length", node.expr.gen_loc, node.gen_loc)
         # Store the length instruction
         self.current_block.append(length_inst)
 
     def visit_NewArray(self, node: NewArray):
-        #self.print_debug(type(node).__name__, node)
         # Visita array size
         self.visit(node.size)
-        if not hasattr(node.size, "gen_loc") or node.size.gen_loc is None:
+        if node.size.gen_loc is None:
             raise Exception("[CodeGen] NewArray: size sem gen_loc.")
         size_loc = node.size.gen_loc
 
         # Alocate register to set result
         result = self.new_temp()
         node.gen_loc = result
+        node.gen_is_temp = True
 
         elem_type = node.type.name if hasattr(node.type, 'name') else node.type.typename
         
-        instr = (f"new_array_{elem_type}", size_loc, result)
+        instr = (_mangle("new_array", elem_type), size_loc, result)
         
         #self.current_block.append((f"new_array_{elem_type}", size_loc, result))
         if self.current_block is not None:
@@ -1050,45 +1527,45 @@ class CodeGenerator(NodeVisitor):
             self.text.append(instr)
      
     def visit_NewObject(self, node: NewObject):
-        #self.print_debug(type(node).__name__, node)
-        
         # Decide o registrador alvo
-        if hasattr(node, "target_reg"):
+        if node.target_reg is not None:
             reg = node.target_reg
         else:
             reg = self.new_temp()
 
         class_name = node.type.typename
-        self.current_block.append((f"new_@{class_name}", reg))
+        self.current_block.append((_mangle("new", "@" + class_name), reg))
         node.gen_loc = reg
-
-        # Inicializa campos da classe, se definidos
-        if class_name in self.class_fields:
-            for instr in self.class_fields[class_name]:
-                if instr[0].startswith("field_"):
-                    field_type = instr[0][6:]       # Ex: 'int'
-                    field_full = instr[1]           # Ex: '@Program.n'
-                    field_value = instr[2]          # Ex: 8
-
-                    # Só inicializa se tiver valor
-                    if field_value is not None:
-                        field_name = field_full.split('.')[-1]
-
-                        # Carrega o endereço do campo
-                        obj_loaded = self.new_temp()
-                        addr = self.new_temp()
-                        self.current_block.append((f"load_{class_name}", reg, obj_loaded))
-                        self.current_block.append(("load_addr", f"{obj_loaded}.{field_name}", addr))
-
-                        # Carrega o valor (literal)
-                        temp = self.new_temp()
-                        self.current_block.append((f"literal_{field_type}", field_value, temp))
-
-                        # Inicializa o campo
-                        self.current_block.append((f"store_{field_type}", temp, addr))
+        node.gen_is_temp = node.target_reg is None
+
+        # Inicializa campos da classe, se definidos.
+        # Classes declared further down have no fields resolved yet
+        template = self._init_templates.get(class_name)
+        if template is None:
+            if class_name not in self._resolved_fields:
+                return
+            template = self._init_templates[class_name] = self._compile_init_template(class_name)
+
+        # Per field: load the object, take the field address, load the
+        # literal and store it (emitted with a single extend)
+        buf = []
+        for load_op, field_suffix, literal_op, field_value, store_op in template:
+            obj_loaded = self.new_temp()
+            addr = self.new_temp()
+            temp = self.new_temp()
+            buf.append((load_op, reg, obj_loaded))
+            buf.append(("load_addr", obj_loaded + field_suffix, addr))
+            buf.append((literal_op, field_value, temp))
+            buf.append((store_op, temp, addr))
+
+            # The three temporaries are dead after the store: reuse them
+            # for the next field
+            self.kill_temp(temp)
+            self.kill_temp(addr)
+            self.kill_temp(obj_loaded)
+        self.current_block.instructions.extend(buf)
 
     def visit_Constant(self, node: Constant):
-        #self.print_debug(type(node).__name__, node)
         value = node.value
         
         # Se estamos em contexto de método (bloco ativo)
@@ -1096,22 +1573,22 @@ class CodeGenerator(NodeVisitor):
             
             if isinstance(value, int):
                 node.gen_loc = self.new_temp()
+                node.gen_is_temp = True
                 self.current_block.append(("literal_int", value, node.gen_loc))
         
             elif isinstance(value, bool):
                 node.gen_loc = self.new_temp()
+                node.gen_is_temp = True
                 self.current_block.append(("literal_boolean", value, node.gen_loc))
         
             elif isinstance(value, str):
                 # Gera um rótulo global único
                 label = self.new_text("str")
                 # Adiciona ao início do código global
-                self.text.insert(0, ("global_String", label, value[1:-1]))
+                self.text.appendleft(("global_String", label, value[1:-1]))
                 # Usa o rótulo como localização da string
                 node.gen_loc = label
-        
-            elif isinstance(value, chr):
-                self.current_block.append(("literal_char", value, node.gen_loc))
+                node.gen_is_temp = False
         
             else:
                 raise Exception(f"[CodeGen] Unsupported constant type: {type(value)}")
@@ -1119,21 +1596,22 @@ class CodeGenerator(NodeVisitor):
             # Fora de método (ex: em campo da classe)
             if isinstance(value, str):
                 label = self.new_text("str")
-                self.text.insert(0, ("global_String", label, value))
+                self.text.appendleft(("global_String", label, value))
                 node.gen_loc = label
+                node.gen_is_temp = False
             else:
                 node.gen_loc = value  # só registra o valor diretamente
+                node.gen_is_temp = False
             
     def visit_This(self, node: This):
-        #self.print_debug(type(node).__name__, node)
         node.gen_loc = "%this"
+        node.gen_is_temp = False
 
     def visit_ID(self, node: ID):
-        #self.print_debug(type(node).__name__, node)
         var_name = node.name
 
-        if var_name in self.name_map:
-            reg_name = self.name_map[var_name]
+        reg_name = self._resolve(var_name)
+        if reg_name is not None:
             if not reg_name.startswith("%"):
                 reg_name = f"%{reg_name}"
 
@@ -1141,31 +1619,30 @@ class CodeGenerator(NodeVisitor):
             if node.type and node.type.typename.endswith("[]"):
                 # Em acesso direto de array, não se faz load do array em si
                 node.gen_loc = reg_name  # já é a 
+                node.gen_is_temp = False
             
             # Special handling for objects: don't load them
             elif node.type.typename not in ["int", "boolean", "char"]:
                 node.gen_loc = reg_name  # object references shouldn't be loaded
+                node.gen_is_temp = False
             
             else:
-                temp = self.new_temp()
-                self.current_block.append((f"load_{node.type.typename}", reg_name, temp))
-                node.gen_loc = temp
+                node.gen_loc = self._emit_pure(_load(node.type.typename), reg_name)
+                node.gen_is_temp = True
         else:
             raise Exception(f"[CodeGen] ID '{var_name}' not found in current scope")
 
     def visit_Type(self, node: Type):
-        #self.print_debug(type(node).__name__, node)
         node.gen_loc = None
+        node.gen_is_temp = False
 
     def visit_Extends(self, node: Extends):
-        #self.print_debug(type(node).__name__, node)
         #subclass = node.name.name
         #superclass = node.parent.name
         #self.text.append(('class', f"@{subclass}", superclass))
         pass
 
     def visit_ExprList(self, node: ExprList):
-        #self.print_debug(type(node).__name__, node)
         for expr in node.exprs:
             self.visit(expr)
 
@@ -1178,6 +1655,7 @@ class CodeGenerator(NodeVisitor):
             values.append(expr.value)
 
         node.gen_loc = self.new_temp()
+        node.gen_is_temp = True
         node.gen_values = values  # ← usado em global_int[]_N
         self.current_block.append(("init_list", gen_locs, node.gen_loc))
 
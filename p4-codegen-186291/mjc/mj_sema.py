@@ -127,11 +127,14 @@ class NodeVisitor:
         if self._method_cache is None:
             self._method_cache = {}
 
-        visitor = self._method_cache.get(node.__class__.__name__)
+        # Keyed by the node class itself, which saves the __name__ lookup
+        # on every call
+        cls = node.__class__
+        visitor = self._method_cache.get(cls)
         if visitor is None:
-            method = "visit_" + node.__class__.__name__
+            method = "visit_" + cls.__name__
             visitor = getattr(self, method, self.generic_visit)
-            self._method_cache[node.__class__.__name__] = visitor
+            self._method_cache[cls] = visitor
 
         return visitor(node)
 
@@ -0,0 +1,10 @@
+import pytest
+
+from mjc.mj_parser import MJParser
+
+
+# Building the parser is the expensive part of each test case, and parse()
+# resets its state on every call, so one instance serves the whole session
+@pytest.fixture(scope="session")
+def parser():
+    return MJParser(debug=False)
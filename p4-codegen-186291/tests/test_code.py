@@ -3,8 +3,8 @@ from pathlib import Path
 import pytest
 
 from mjc.mj_code import CodeGenerator
+from mjc.mj_code_aux import CodeGenerator as AuxCodeGenerator
 from mjc.mj_interpreter import MJIRInterpreter
-from mjc.mj_parser import MJParser
 from mjc.mj_sema import SemanticAnalyzer, SymbolTableBuilder
 
 
@@ -60,12 +60,11 @@ def resolve_test_files(test_name):
     ],
 )
 # capfd will capture the stdout/stderr outputs generated during the test
-def test_code(test_name, capsys):
+def test_code(parser, test_name, capsys):
     input_path, expected_path = resolve_test_files(test_name)
 
-    p = MJParser(debug=False)
     with open(input_path) as f_in, open(expected_path) as f_ex:
-        ast = p.parse(f_in.read())
+        ast = parser.parse(f_in.read())
         global_symtab_builder = SymbolTableBuilder()
         global_symtab = global_symtab_builder.visit(ast)
         sema = SemanticAnalyzer(global_symtab=global_symtab)
@@ -81,3 +80,42 @@ def test_code(test_name, capsys):
         expect = f_ex.read()
     assert captured.out == expect
     assert captured.err == ""
+
+
+FIELD_CONDITIONS = """
+class Program {
+    boolean on;
+    int n;
+
+    public static void main(String[] args) {
+        if (this.on) print("on");
+        while (this.on) { break; }
+        assert this.on;
+        if (this.n < 2) print("small");
+        assert this.n == 0;
+    }
+}
+"""
+
+
+def test_field_conditions_are_loaded(parser):
+    ast = parser.parse(FIELD_CONDITIONS)
+    global_symtab = SymbolTableBuilder().visit(ast)
+    SemanticAnalyzer(global_symtab=global_symtab).visit(ast)
+    gen = AuxCodeGenerator(False)
+    gen.visit(ast)
+    code = gen.code
+
+    defs = {inst[-1]: inst for inst in code if isinstance(inst[-1], str)}
+    cbranches = [inst for inst in code if inst[0] == "cbranch"]
+    assert len(cbranches) == 5
+
+    # if/while/assert on a boolean field branch on the loaded value, never
+    # on the field address itself
+    loaded = [defs[c[1]] for c in cbranches[:3]]
+    for inst in loaded:
+        assert inst[0] == "load_boolean"
+        assert defs[inst[1]] == ("load_addr", "%this.on", inst[1])
+
+    # comparisons already produce a fresh temporary: no extra load
+    assert [defs[c[1]][0] for c in cbranches[3:]] == ["lt_int", "eq_int"]
@@ -1,7 +1,9 @@
 import argparse
+import operator
 import pathlib
 import sys
-from typing import List, Tuple
+from collections import defaultdict, deque
+from typing import Dict, List, Optional, Set, Tuple
 
 import rich
 
@@ -9,33 +11,248 @@ from mjc.mj_ast import ClassDecl, Program
 from mjc.mj_block import (
     CFG,
     BasicBlock,
+    Block,
     ConditionBlock,
     EmitBlocks,
     format_instruction,
 )
-from mjc.mj_code import CodeGenerator
 from mjc.mj_interpreter import MJIRInterpreter
-from mjc.mj_parser import MJParser
-from mjc.mj_sema import NodeVisitor, SemanticAnalyzer, SymbolTableBuilder
+
+# Opcodes whose last operand is the register written by the instruction
+BINARY_OPS = frozenset(
+    ("add", "sub", "mul", "div", "mod", "lt", "le", "gt", "ge", "eq", "ne", "and", "or")
+)
+WRITES_LAST = BINARY_OPS | {
+    "not",
+    "load",
+    "literal",
+    "elem",
+    "get",
+    "length",
+    "new",
+    "call",
+}
+# Opcodes whose first operand is the only one read by the instruction
+READS_FIRST = frozenset(
+    ("not", "load", "length", "get", "param", "print", "cbranch", "return", "call")
+)
+# Opcodes without side effects, which can be removed when their target is dead
+# (div and mod are kept since they may stop the program on a division by zero)
+PURE_OPS = (BINARY_OPS - {"div", "mod"}) | {
+    "not",
+    "load",
+    "literal",
+    "elem",
+    "get",
+    "length",
+    "new",
+}
+
+# Opcodes of the class declarations kept as they are in the optimized code
+CLASS_OPS = frozenset(("class", "field"))
+
+PRIMITIVE_TYPES = frozenset(("int", "char", "boolean"))
+
+# Constant folding of the binary operations, as done by the interpreter
+FOLDERS = {
+    "add": operator.add,
+    "sub": operator.sub,
+    "mul": operator.mul,
+    "div": operator.floordiv,
+    "mod": operator.mod,
+    "lt": operator.lt,
+    "le": operator.le,
+    "gt": operator.gt,
+    "ge": operator.ge,
+    "eq": operator.eq,
+    "ne": operator.ne,
+    "and": lambda left, right: left and right,
+    "or": lambda left, right: left or right,
+}
+
+# Value of a register that is not a known constant
+NAC = object()
+
+
+def is_label(instr: Tuple) -> bool:
+    return len(instr) == 1 and instr[0].endswith(":")
+
+
+def is_field_access(operand) -> bool:
+    """Returns True if the operand is a field access (%var.field)"""
+    return (
+        isinstance(operand, str)
+        and operand.startswith("%")
+        and "." in operand
+        and not operand.split(".")[-1].isdigit()
+    )
+
+
+def register_of(operand) -> Optional[str]:
+    """Returns the register read through an operand: the object of a
+    field access, the operand itself if it is a register or None."""
+    if not isinstance(operand, str) or not operand.startswith("%"):
+        return None
+    if is_field_access(operand):
+        return operand.split(".")[0]
+    return operand
+
+
+def writes_register(instr: Tuple) -> bool:
+    """Returns True if a store writes the value of its target register,
+    instead of the memory it points to."""
+    return len(instr[0].split("_")) == 2 and not is_field_access(instr[2])
 
 
-class DataFlow(NodeVisitor):
+def defs_of(instr: Tuple) -> Tuple[str, ...]:
+    """Returns the registers defined by an instruction."""
+    op = instr[0].split("_")[0]
+    if op in WRITES_LAST:
+        return (instr[-1],)
+    if op == "alloc":
+        return (instr[1],)
+    if op == "store" and writes_register(instr):
+        return (instr[2],)
+    if op == "define":
+        return tuple(name for _, name in instr[2])
+    return ()
+
+
+def uses_of(instr: Tuple) -> Tuple[str, ...]:
+    """Returns the registers read by an instruction."""
+    op = instr[0].split("_")[0]
+    if op in BINARY_OPS or op == "elem":
+        operands = instr[1:3]
+    elif op in READS_FIRST:
+        operands = instr[1:2]
+    elif op == "store":
+        operands = instr[1:2] if writes_register(instr) else instr[1:3]
+    else:
+        return ()
+    return tuple(reg for reg in map(register_of, operands) if reg is not None)
+
+
+def literal_of(value, target: str) -> Optional[Tuple]:
+    """Returns a literal instruction loading exactly value into target."""
+    if isinstance(value, bool):
+        return ("literal_boolean", value, target)
+    if isinstance(value, int):
+        return ("literal_int", value, target)
+    if isinstance(value, str):
+        return ("literal_char", value, target)
+    return None
+
+
+def rd_solve(
+    gen: List[int],
+    kill: List[int],
+    preds: List[List[int]],
+    succs: List[List[int]],
+    order: List[int],
+    rd_in: List[int],
+    rd_out: List[int],
+):
+    """Solves the reaching definitions of the blocks in place, with a
+    worklist over the transfer function OUT = GEN | (IN & ~KILL) seeded in
+    the given order. Only the successors of a changed block are queued."""
+    worklist = deque(order)
+    queued = [True] * len(gen)
+    while worklist:
+        index = worklist.popleft()
+        queued[index] = False
+        in_ = 0
+        for pred in preds[index]:
+            in_ |= rd_out[pred]
+        rd_in[index] = in_
+        out = gen[index] | (in_ & ~kill[index])
+        if out != rd_out[index]:
+            rd_out[index] = out
+            for succ in succs[index]:
+                if not queued[succ]:
+                    queued[succ] = True
+                    worklist.append(succ)
+
+
+def lv_solve(
+    use: List[int],
+    def_: List[int],
+    preds: List[List[int]],
+    succs: List[List[int]],
+    order: List[int],
+    lv_in: List[int],
+    lv_out: List[int],
+):
+    """Solves the live variables of the blocks in place, with a worklist
+    over the transfer function IN = USE | (OUT & ~DEF) seeded in the given
+    order. Only the predecessors of a changed block are queued."""
+    worklist = deque(order)
+    queued = [True] * len(use)
+    while worklist:
+        index = worklist.popleft()
+        queued[index] = False
+        out = 0
+        for succ in succs[index]:
+            out |= lv_in[succ]
+        lv_out[index] = out
+        in_ = use[index] | (out & ~def_[index])
+        if in_ != lv_in[index]:
+            lv_in[index] = in_
+            for pred in preds[index]:
+                if not queued[pred]:
+                    queued[pred] = True
+                    worklist.append(pred)
+
+
+class DataFlow:
     def __init__(self, viewcfg: bool):
         # flag to show the optimized control flow graph
         self.viewcfg: bool = viewcfg
         # list of code instructions after optimizations
         self.code: List[Tuple[str]] = []
-        # TODO
+        # basic blocks of the method being optimized and their edges
+        self.blocks: List[List[Tuple[str]]] = []
+        self.labels: Dict[str, int] = {}
+        self.succs: List[List[int]] = []
+        self.preds: List[List[int]] = []
+        # depth-first order of the blocks and the ones it reaches, computed
+        # once for each split of the method in blocks
+        self._rpo: Optional[List[int]] = None
+        self._reached: Set[int] = set()
+        # reaching definitions: every definition site as a
+        # (block, index, register) triple, the bitset of the definitions
+        # of each register and the gen/kill/in/out bitsets of each block
+        self.rd_defs: List[Tuple[int, int, str]] = []
+        self.rd_defs_of: Dict[str, int] = {}
+        self.rd_first: List[int] = []
+        self.rd_values: Dict[int, object] = {}
+        self.rd_gen: List[int] = []
+        self.rd_kill: List[int] = []
+        self.rd_in: List[int] = []
+        self.rd_out: List[int] = []
+        # live variables: the bit of each register and the use/def/in/out
+        # bitsets of each block
+        self.lv_vars: Dict[str, int] = {}
+        self.lv_use: List[int] = []
+        self.lv_def: List[int] = []
+        self.lv_in: List[int] = []
+        self.lv_out: List[int] = []
+        # registers defined and used by each instruction as bitsets, and
+        # whether it can be removed, in parallel with the blocks
+        self.lv_insts: List[List[Tuple[int, int, bool]]] = []
 
     def show(self):
-        _str = ""
-        for _code in self.code:
-            _str += format_instruction(_code) + "\n"
+        _str = "\n".join(map(format_instruction, self.code))
         rich.print(_str.strip())
 
+    def visit(self, node):
+        """Visit a Program or ClassDecl node. DataFlow works on the MJIR the
+        code generator left in the AST, so it needs no other visitors (nor
+        the front end importing them)."""
+        return getattr(self, "visit_" + node.__class__.__name__)(node)
+
     def visit_Program(self, node: Program):
         # First, save the global instructions on code member
-        self.code = node.text[:]  # [:] to do a copy
+        self.code = list(node.text)
 
         # Visit all class declaration in the program
         for class_decl in node.class_decls:
@@ -44,33 +261,13 @@ class DataFlow(NodeVisitor):
     def visit_ClassDecl(self, node: ClassDecl):
         bb = EmitBlocks()
         bb.visit(node.cfg)
-        for _code in bb.code:
-            if "class" in _code[0] or "field" in _code[0]:
-                self.code.append(_code)
+        self.code.extend(
+            _code for _code in bb.code if _code[0].split("_", 1)[0] in CLASS_OPS
+        )
 
         for method_decl in node.method_decls:
             self.current_func = method_decl
-            # start with Reach Definitions Analysis
-            self.buildRD_blocks(method_decl.cfg)
-            self.computeRD_gen_kill()
-            self.computeRD_in_out()
-            # and do constant propagation optimization
-            self.constant_propagation()
-
-            # after do live variable analysis
-            self.buildLV_blocks(method_decl.cfg)
-            self.computeLV_use_def()
-            self.computeLV_in_out()
-            # and do dead code elimination
-            self.deadcode_elimination()
-
-            # after that do cfg simplify (optional)
-            self.short_circuit_jumps(method_decl.cfg)
-            self.merge_blocks(method_decl.cfg)
-            self.discard_unused_allocs(method_decl.cfg)
-
-            # finally save optimized instructions in self.code
-            self.appendOptimizedCode(method_decl.cfg)
+            self.optimize_method(method_decl)
 
         if self.viewcfg:
             for method_decl in node.method_decls:
@@ -83,7 +280,420 @@ class DataFlow(NodeVisitor):
                 dot = CFG(f"@{node.name.name}.{method_name}.opt")
                 dot.view(method_decl.cfg)
 
-    # TODO: add dataflow analysis
+    def optimize_method(self, method_decl):
+        """Runs the whole pipeline on a method and appends its optimized
+        code. It only reads the method cfg, so methods are independent."""
+        # start with Reach Definitions Analysis
+        self.buildRD_blocks(method_decl.cfg)
+        self.computeRD_gen_kill()
+        self.computeRD_in_out()
+        # and do constant propagation optimization
+        self.constant_propagation()
+
+        # after do live variable analysis
+        self.buildLV_blocks(method_decl.cfg)
+        self.computeLV_use_def()
+        self.computeLV_in_out()
+        # and do dead code elimination
+        self.deadcode_elimination()
+
+        # after that do cfg simplify (optional)
+        self.short_circuit_jumps(method_decl.cfg)
+        self.merge_blocks(method_decl.cfg)
+        self.discard_unused_allocs(method_decl.cfg)
+
+        # finally save optimized instructions in self.code
+        self.appendOptimizedCode(method_decl.cfg)
+
+    def _build_blocks(self, code: List[Tuple[str]]):
+        """Split the instructions of a method in basic blocks and link every
+        block to its successors and predecessors by its jump targets.
+        """
+        self.blocks = []
+        block = []
+        for instr in code:
+            if block and is_label(instr):
+                self.blocks.append(block)
+                block = []
+            block.append(instr)
+            if instr[0] in ("jump", "cbranch") or instr[0].startswith("return"):
+                self.blocks.append(block)
+                block = []
+        if block:
+            self.blocks.append(block)
+
+        self.labels = labels = {
+            "%" + block[0][0][:-1]: index
+            for index, block in enumerate(self.blocks)
+            if is_label(block[0])
+        }
+        self.succs = []
+        self.preds = [[] for _ in self.blocks]
+        self._rpo = None
+        for index, block in enumerate(self.blocks):
+            last = block[-1]
+            if last[0] == "jump":
+                succs = [labels[last[1]]]
+            elif last[0] == "cbranch":
+                succs = list(dict.fromkeys((labels[last[2]], labels[last[3]])))
+            elif last[0].startswith("return") or index + 1 == len(self.blocks):
+                succs = []
+            else:
+                succs = [index + 1]
+            self.succs.append(succs)
+            for succ in succs:
+                self.preds[succ].append(index)
+
+    def _reverse_postorder(self) -> List[int]:
+        """Returns the blocks in reverse postorder of a depth-first search
+        from the first block, followed by the unreachable ones. The order is
+        kept until the blocks are split again.
+        """
+        if self._rpo is not None:
+            return self._rpo
+        order = []
+        visited = {0}
+        stack = [(0, iter(self.succs[0]))]
+        while stack:
+            index, succs = stack[-1]
+            for succ in succs:
+                if succ not in visited:
+                    visited.add(succ)
+                    stack.append((succ, iter(self.succs[succ])))
+                    break
+            else:
+                stack.pop()
+                order.append(index)
+        order.reverse()
+        order.extend(index for index in range(len(self.blocks)) if index not in visited)
+        self._rpo = order
+        self._reached = visited
+        return order
+
+    def buildRD_blocks(self, cfg: Block):
+        bb = EmitBlocks()
+        bb.visit(cfg)
+        self._build_blocks(bb.code)
+
+    def computeRD_gen_kill(self):
+        # number every definition site once
+        self.rd_defs = []
+        self.rd_defs_of = defaultdict(int)
+        self.rd_first = []
+        for index, block in enumerate(self.blocks):
+            self.rd_first.append(len(self.rd_defs))
+            for pos, instr in enumerate(block):
+                for reg in defs_of(instr):
+                    self.rd_defs_of[reg] |= 1 << len(self.rd_defs)
+                    self.rd_defs.append((index, pos, reg))
+
+        self.rd_gen = []
+        self.rd_kill = []
+        bit = 1
+        for block in self.blocks:
+            gen = kill = 0
+            for instr in block:
+                for reg in defs_of(instr):
+                    others = self.rd_defs_of[reg]
+                    gen = (gen & ~others) | bit
+                    kill |= others
+                    bit <<= 1
+            self.rd_gen.append(gen)
+            self.rd_kill.append(kill)
+
+    def computeRD_in_out(self):
+        self.rd_in = [0] * len(self.blocks)
+        self.rd_out = list(self.rd_gen)
+        rd_solve(
+            self.rd_gen,
+            self.rd_kill,
+            self.preds,
+            self.succs,
+            self._reverse_postorder(),
+            self.rd_in,
+            self.rd_out,
+        )
+
+    @staticmethod
+    def _split_code(block: List[Tuple]) -> Tuple[List[str], List[str]]:
+        """Returns the opcodes and the types of the instructions of a block
+        as parallel lists."""
+        ops, types = [], []
+        for instr in block:
+            op, _, ty = instr[0].partition("_")
+            ops.append(op)
+            types.append(ty)
+        return ops, types
+
+    def _reaching_value(self, reach: int, reg: str):
+        """Returns the constant held by reg if all of its definitions in
+        reach agree on it, otherwise NAC."""
+        defs = reach & self.rd_defs_of.get(reg, 0)
+        value = NAC
+        while defs:
+            low = defs & -defs
+            current = self.rd_values.get(low.bit_length() - 1, NAC)
+            if current is NAC:
+                return NAC
+            if value is not NAC and (
+                type(current) is not type(value) or current != value
+            ):
+                return NAC
+            value = current
+            defs ^= low
+        return value
+
+    def constant_propagation(self):
+        self.rd_values = rd_values = {}
+        defs_of_reg = self.rd_defs_of
+        # visiting the blocks in reverse postorder evaluates the definitions
+        # before their uses, except along back edges where they stay NAC
+        for index in self._reverse_postorder():
+            block = self.blocks[index]
+            ops, types = self._split_code(block)
+            reach = self.rd_in[index]
+            values = {}  # constant of each register at the current instruction
+            def_id = self.rd_first[index]
+
+            def value_of(operand):
+                reg = register_of(operand)
+                if reg is None or reg != operand:
+                    return NAC
+                if reg not in values:
+                    values[reg] = self._reaching_value(reach, reg)
+                return values[reg]
+
+            for pos, instr in enumerate(block):
+                op, ty = ops[pos], types[pos]
+                value = NAC
+                if op == "literal":
+                    value = instr[1]
+                    if ty == "int":
+                        value = int(value)
+                    elif ty == "char":
+                        value = str(value)
+                elif op == "alloc":
+                    if ty in PRIMITIVE_TYPES:
+                        value = 0
+                elif op == "store":
+                    if ty in PRIMITIVE_TYPES:
+                        value = value_of(instr[1])
+                elif op == "load":
+                    if ty in PRIMITIVE_TYPES:
+                        value = value_of(instr[1])
+                        literal = literal_of(value, instr[2])
+                        if literal is not None:
+                            block[pos] = literal
+                elif op in FOLDERS:
+                    if ty in PRIMITIVE_TYPES:
+                        left, right = value_of(instr[1]), value_of(instr[2])
+                        if left is not NAC and right is not NAC:
+                            try:
+                                value = FOLDERS[op](left, right)
+                            except ZeroDivisionError:
+                                value = NAC
+                            literal = literal_of(value, instr[3])
+                            if literal is None:
+                                value = NAC
+                            else:
+                                block[pos] = literal
+                elif op == "not":
+                    value = value_of(instr[1])
+                    if value is not NAC:
+                        value = not value
+                        block[pos] = ("literal_boolean", value, instr[2])
+                elif op == "cbranch":
+                    value = value_of(instr[1])
+                    if value is not NAC:
+                        block[pos] = ("jump", instr[2] if value else instr[3])
+
+                for reg in defs_of(instr):
+                    if value is not NAC:
+                        rd_values[def_id] = value
+                    reach = (reach & ~defs_of_reg[reg]) | (1 << def_id)
+                    values[reg] = value
+                    def_id += 1
+
+    def buildLV_blocks(self, cfg: Block):
+        # constant propagation may have turned branches into jumps,
+        # so split the current code instead of the original cfg
+        self._build_blocks([instr for block in self.blocks for instr in block])
+
+    def computeLV_use_def(self):
+        self.lv_vars = lv_vars = {}
+        self.lv_use = []
+        self.lv_def = []
+        self.lv_insts = []
+        for block in self.blocks:
+            use = def_ = 0
+            insts = []
+            for instr in block:
+                uses = defs = 0
+                for reg in uses_of(instr):
+                    uses |= lv_vars.setdefault(reg, 1 << len(lv_vars))
+                for reg in defs_of(instr):
+                    defs |= lv_vars.setdefault(reg, 1 << len(lv_vars))
+                use |= uses & ~def_
+                def_ |= defs
+                op = instr[0].split("_")[0]
+                insts.append((defs, uses, op in PURE_OPS or op == "store"))
+            self.lv_use.append(use)
+            self.lv_def.append(def_)
+            self.lv_insts.append(insts)
+
+    def computeLV_in_out(self):
+        self.lv_in = [0] * len(self.blocks)
+        self.lv_out = [0] * len(self.blocks)
+        # a backward problem converges faster visiting successors first
+        order = self._reverse_postorder()[::-1]
+        lv_solve(
+            self.lv_use,
+            self.lv_def,
+            self.preds,
+            self.succs,
+            order,
+            self.lv_in,
+            self.lv_out,
+        )
+
+    def deadcode_elimination(self):
+        removed = True
+        while removed:
+            removed = False
+            for index, block in enumerate(self.blocks):
+                live = self.lv_out[index]
+                kept = []
+                insts = self.lv_insts[index]
+                for pos in range(len(block) - 1, -1, -1):
+                    defs, uses, pure = insts[pos]
+                    if defs and pure and not live & defs:
+                        removed = True
+                        continue
+                    live = (live & ~defs) | uses
+                    kept.append(block[pos])
+                kept.reverse()
+                self.blocks[index] = kept
+            if removed:
+                # removing a dead instruction may kill its operands as well
+                self.computeLV_use_def()
+                self.computeLV_in_out()
+
+    def short_circuit_jumps(self, cfg: Block):
+        # blocks holding just a label and a jump are joined to the block they
+        # jump to, in a disjoint set whose roots are the final targets
+        blocks, labels = self.blocks, self.labels
+        parent = list(range(len(blocks)))
+
+        def find(index: int) -> int:
+            root = index
+            while parent[root] != root:
+                root = parent[root]
+            while parent[index] != root:
+                parent[index], index = root, parent[index]
+            return root
+
+        for index, block in enumerate(blocks):
+            if len(block) == 2 and is_label(block[0]) and block[1][0] == "jump":
+                target = find(labels[block[1][1]])
+                if target != index:
+                    parent[index] = target
+
+        def resolve(label: str) -> str:
+            return "%" + blocks[find(labels[label])][0][0][:-1]
+
+        for block in blocks:
+            last = block[-1] if block else ("",)
+            if last[0] == "jump":
+                block[-1] = ("jump", resolve(last[1]))
+            elif last[0] == "cbranch":
+                true_label, false_label = resolve(last[2]), resolve(last[3])
+                if true_label == false_label:
+                    block[-1] = ("jump", true_label)
+                else:
+                    block[-1] = ("cbranch", last[1], true_label, false_label)
+        self._build_blocks([instr for block in blocks for instr in block])
+
+    def merge_blocks(self, cfg: Block):
+        # drop the blocks that are not reachable from the method entry
+        reachable = self._reachable()
+        blocks = [self.blocks[index] for index in sorted(reachable)]
+
+        # jumps to the block that follows are replaced by the fall through
+        for index, block in enumerate(blocks[:-1]):
+            following = blocks[index + 1][0]
+            if (
+                block[-1][0] == "jump"
+                and is_label(following)
+                and block[-1][1] == "%" + following[0][:-1]
+            ):
+                blocks[index] = block[:-1]
+
+        # and a block whose label is no longer targeted joins its predecessor
+        targets = set()
+        for block in blocks:
+            if block and block[-1][0] == "jump":
+                targets.add(block[-1][1])
+            elif block and block[-1][0] == "cbranch":
+                targets.update(block[-1][2:])
+        self._build_blocks(
+            [
+                instr
+                for block in blocks
+                for instr in block
+                if not is_label(instr) or "%" + instr[0][:-1] in targets
+            ]
+        )
+
+    def _reachable(self) -> Set[int]:
+        """Returns the blocks reachable from the method entry."""
+        self._reverse_postorder()
+        return self._reached
+
+    def discard_unused_allocs(self, cfg: Block):
+        # count the references to each register besides its alloc
+        refs = defaultdict(int)
+        for block in self.blocks:
+            for instr in block:
+                if not instr[0].startswith("alloc"):
+                    for operand in instr[1:]:
+                        reg = register_of(operand)
+                        if reg is not None:
+                            refs[reg] += 1
+        for index, block in enumerate(self.blocks):
+            self.blocks[index] = [
+                instr
+                for instr in block
+                if not instr[0].startswith("alloc") or refs[instr[1]]
+            ]
+
+    def _build_cfg(self) -> Block:
+        """Returns a new cfg linking the optimized blocks of the method."""
+        nodes = []
+        for block in self.blocks:
+            label = block[0][0][:-1] if is_label(block[0]) else None
+            if block[-1][0] == "cbranch":
+                node = ConditionBlock(label)
+            else:
+                node = BasicBlock(label)
+            node.instructions = block
+            nodes.append(node)
+        for index, node in enumerate(nodes):
+            if index + 1 < len(nodes):
+                node.next_block = nodes[index + 1]
+            succs = [nodes[succ] for succ in self.succs[index]]
+            if isinstance(node, ConditionBlock):
+                node.taken, node.fall_through = succs[0], succs[-1]
+            elif succs:
+                node.branch = succs[0]
+            for succ in succs:
+                succ.predecessors.append(node)
+        return nodes[0]
+
+    def appendOptimizedCode(self, cfg: Block):
+        for block in self.blocks:
+            self.code.extend(block)
+        if self.viewcfg:
+            self.current_func.cfg = self._build_cfg()
 
 
 def main():
@@ -133,6 +743,11 @@ def main():
         print("Input", input_path, "not found", file=sys.stderr)
         sys.exit(1)
 
+    # the front end is only needed to compile the input file
+    from mjc.mj_code import CodeGenerator
+    from mjc.mj_parser import MJParser
+    from mjc.mj_sema import SemanticAnalyzer, SymbolTableBuilder
+
     # set error function
     p = MJParser()
     # open file and parse it
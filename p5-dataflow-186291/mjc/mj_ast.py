@@ -87,6 +87,10 @@ class Coord:
 class Node(ABC):
     """Abstract base class for AST nodes."""
 
+    # The position of every node and the attributes filled in by the code
+    # generator live in slots; anything else goes to the instance __dict__
+    __slots__ = ("coord", "gen_loc", "cfg", "__dict__")
+
     attr_names = ()
 
     @abstractmethod
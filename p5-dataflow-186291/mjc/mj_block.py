@@ -52,13 +52,9 @@ def format_instruction(t: tuple) -> str:
             elif op == "sitofp" or op == "fptosi":
                 _str += f"{t[2]} = {op} {t[1]}"
             elif op == "store" or op == "param":
-                _str += f"{op} {ty} "
-                for _el in t[1:]:
-                    _str += f"{_el} "
+                _str += f"{op} {ty} " + "".join(f"{_el} " for _el in t[1:])
             else:
-                _str += f"{t[-1]} = {op} {ty} "
-                for _el in t[1:-1]:
-                    _str += f"{_el} "
+                _str += f"{t[-1]} = {op} {ty} " + "".join(f"{_el} " for _el in t[1:-1])
             return _str
     elif ty == "void":
         return f"  {op}"
@@ -67,6 +63,8 @@ def format_instruction(t: tuple) -> str:
 
 
 class Block:
+    __slots__ = ("label", "instructions", "predecessors", "next_block")
+
     def __init__(self, label: str):
         self.label: str = label  # Label that identifies the block
         self.instructions: List[Tuple[str]] = []  # Instructions in the block
@@ -86,6 +84,8 @@ class BasicBlock(Block):
     flows to the next block.
     """
 
+    __slots__ = ("branch",)
+
     def __init__(self, label: str):
         super(BasicBlock, self).__init__(label)
         self.branch: Optional[Block] = (
@@ -99,6 +99,8 @@ class ConditionBlock(Block):
     There are two branches to handle each possibility.
     """
 
+    __slots__ = ("taken", "fall_through")
+
     def __init__(self, label: str):
         super(ConditionBlock, self).__init__(label)
         self.taken: Optional[Block] = None
@@ -125,12 +127,10 @@ class EmitBlocks(BlockVisitor):
         self.code: List[Tuple[str]] = []
 
     def visit_BasicBlock(self, block: Block):
-        for inst in block.instructions:
-            self.code.append(inst)
+        self.code.extend(block.instructions)
 
     def visit_ConditionBlock(self, block: Block):
-        for inst in block.instructions:
-            self.code.append(inst)
+        self.code.extend(block.instructions)
 
 
 class CFG:
@@ -19,6 +19,16 @@ from mjc.mj_parser import MJParser
 from mjc.mj_sema import NodeVisitor, SemanticAnalyzer, SymbolTableBuilder
 from mjc.mj_type import CharType, IntType, VoidType
 
+# Interned name of each temporary number, shared by all the functions
+_TEMPS: Dict[int, str] = {}
+
+
+def _temp(n: int) -> str:
+    name = _TEMPS.get(n)
+    if name is None:
+        name = _TEMPS[n] = sys.intern("%" + "%d" % n)
+    return name
+
 
 class CodeGenerator(NodeVisitor):
     """
@@ -46,9 +56,7 @@ class CodeGenerator(NodeVisitor):
         # TODO: Complete if needed.
 
     def show(self):
-        _str = ""
-        for _code in self.code:
-            _str += format_instruction(_code) + "\n"
+        _str = "\n".join(map(format_instruction, self.code))
         rich.print(_str.strip())
 
     def new_temp(self) -> str:
@@ -57,7 +65,7 @@ class CodeGenerator(NodeVisitor):
         """
         if self.fname not in self.versions:
             self.versions[self.fname] = 1
-        name = "%" + "%d" % (self.versions[self.fname])
+        name = _temp(self.versions[self.fname])
         self.versions[self.fname] += 1
         return name
 
@@ -65,7 +73,7 @@ class CodeGenerator(NodeVisitor):
         """
         Create a new literal constant on global section (text).
         """
-        name = "@." + typename + "." + "%d" % (self.versions["_glob_"])
+        name = sys.intern("@." + typename + "." + "%d" % (self.versions["_glob_"]))
         self.versions["_glob_"] += 1
         return name
 
@@ -1,5 +1,7 @@
 import argparse
+import bisect
 import pathlib
+import re
 import sys
 
 from sly import Lexer
@@ -18,14 +20,26 @@ class MJLexer(Lexer):
         # Keeps track of the last token returned from self.token()
         self.last_token = None
 
+        # Offsets of the newlines of the text being scanned
+        self._newlines = []
+
+        # Token lines of scan() not written to stdout yet
+        self._pending = []
+
     def _error(self, msg, token):
+        self._flush_pending()
         location = self._make_tok_location(token)
         self.error_func(msg, location[0], location[1])
         self.index += 1
 
+    def tokenize(self, text, lineno=1, index=0):
+        self._newlines = [match.start() for match in re.finditer("\n", text)]
+        return super().tokenize(text, lineno, index)
+
     def find_tok_column(self, token):
         """Find the column of the token in its line."""
-        last_cr = self.text.rfind("\n", 0, token.index)
+        line = bisect.bisect_left(self._newlines, token.index)
+        last_cr = self._newlines[line - 1] if line else -1
         return token.index - last_cr
 
     def _make_tok_location(self, token):
@@ -36,15 +50,23 @@ class MJLexer(Lexer):
         msg = f"Illegal character {t.value[0]!r}"
         self._error(msg, t)
 
+    def _flush_pending(self):
+        if self._pending:
+            sys.stdout.write("\n".join(self._pending) + "\n")
+            self._pending = []
+
     def scan(self, data):
-        output = ""
+        # write the tokens once at the end, or before an error message
+        lines = []
+        self._pending = []
         for token in self.tokenize(data):
             token_str = (
                 f"LexToken({token.type},{token.value!r},{token.lineno},{token.index})"
             )
-            print(token_str)
-            output += token_str + "\n"
-        return output
+            lines.append(token_str)
+            self._pending.append(token_str)
+        self._flush_pending()
+        return "\n".join(lines) + "\n" if lines else ""
 
     # Set of token names.
     tokens = {
@@ -1,4 +1,5 @@
 import argparse
+import os
 import pathlib
 import sys
 from io import StringIO
@@ -36,6 +37,8 @@ class ParserLogger:
     NOTE: This class overrides the default SlyLogger class
     """
 
+    __slots__ = ("stream",)
+
     def __init__(self):
         self.stream = StringIO()
 
@@ -60,12 +63,16 @@ class ParserLogger:
 class MJParser(Parser):
     tokens = MJLexer.tokens
     start = "program"
-    debugfile = "parser.debug"
+    # SLY writes the whole LALR state machine here when the grammar is built,
+    # so only do it when asked for through the environment
+    debugfile = os.environ.get("MJ_PARSER_DEBUG")
     log = ParserLogger()
 
     def __init__(self, debug=True):
         """Create a new MJParser."""
         self.debug = debug
+        # SLY builds the lexer tables once, with the class: an instance per
+        # parser only holds the state of the text being scanned
         self.mjlex = MJLexer(self._lexer_error)
 
         # Keeps track of the last token given to yacc (the lookahead token)
@@ -89,11 +96,7 @@ class MJParser(Parser):
         sys.exit(1)
 
     def _token_coord(self, p):
-        last_cr = self.mjlex.text.rfind("\n", 0, p.index)
-        if last_cr < 0:
-            last_cr = -1
-        column = p.index - (last_cr)
-        return Coord(p.lineno, column)
+        return Coord(p.lineno, self.mjlex.find_tok_column(p))
 
     precedence = ()
 
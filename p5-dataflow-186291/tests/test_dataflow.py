@@ -0,0 +1,184 @@
+from types import SimpleNamespace
+
+import pytest
+
+from mjc.mj_analysis import DataFlow, lv_solve
+from mjc.mj_block import BasicBlock
+from mjc.mj_interpreter import MJIRInterpreter
+
+# Hand-built MJIR for @Main.main, so the analyses run without the front end
+
+# s = 0; for (i = 0; i < 5; i = i + 1) s = s + i; print(s); with a dead d = 7
+LOOP = [
+    ("entry:",),
+    ("alloc_int", "%i"),
+    ("alloc_int", "%s"),
+    ("alloc_int", "%d"),
+    ("literal_int", 0, "%1"),
+    ("store_int", "%1", "%i"),
+    ("literal_int", 0, "%2"),
+    ("store_int", "%2", "%s"),
+    ("literal_int", 7, "%3"),
+    ("store_int", "%3", "%d"),
+    ("jump", "%for.cond"),
+    ("for.cond:",),
+    ("load_int", "%i", "%4"),
+    ("literal_int", 5, "%5"),
+    ("lt_int", "%4", "%5", "%6"),
+    ("cbranch", "%6", "%for.body", "%for.end"),
+    ("for.body:",),
+    ("load_int", "%s", "%7"),
+    ("load_int", "%i", "%8"),
+    ("add_int", "%7", "%8", "%9"),
+    ("store_int", "%9", "%s"),
+    ("literal_int", 1, "%10"),
+    ("load_int", "%i", "%11"),
+    ("add_int", "%11", "%10", "%12"),
+    ("store_int", "%12", "%i"),
+    ("jump", "%for.cond"),
+    ("for.end:",),
+    ("load_int", "%s", "%13"),
+    ("print_int", "%13"),
+    ("jump", "%exit"),
+    ("exit:",),
+    ("return_void",),
+]
+
+# x = 2 * 3; if (x < 5) print(1); print(x);
+FOLD = [
+    ("entry:",),
+    ("alloc_int", "%x"),
+    ("literal_int", 2, "%1"),
+    ("literal_int", 3, "%2"),
+    ("mul_int", "%1", "%2", "%3"),
+    ("store_int", "%3", "%x"),
+    ("load_int", "%x", "%4"),
+    ("literal_int", 5, "%5"),
+    ("lt_int", "%4", "%5", "%6"),
+    ("cbranch", "%6", "%if.then", "%if.end"),
+    ("if.then:",),
+    ("literal_int", 1, "%7"),
+    ("print_int", "%7"),
+    ("jump", "%if.end"),
+    ("if.end:",),
+    ("load_int", "%x", "%8"),
+    ("print_int", "%8"),
+    ("return_void",),
+]
+
+# d = 1 + 2; print(4); the store to d is dead and so is everything feeding it
+CHAIN = [
+    ("entry:",),
+    ("alloc_int", "%d"),
+    ("literal_int", 1, "%1"),
+    ("literal_int", 2, "%2"),
+    ("add_int", "%1", "%2", "%3"),
+    ("store_int", "%3", "%d"),
+    ("literal_int", 4, "%4"),
+    ("print_int", "%4"),
+    ("return_void",),
+]
+
+HEADER = [("class", "@Main", None)]
+DEFINE = ("define_void", "@Main.main", [("String[]", "%args")])
+
+
+def optimize(body):
+    """Runs the DataFlow pipeline on main() and returns the original and the
+    optimized program."""
+    cfg = BasicBlock("entry")
+    cfg.instructions = [DEFINE] + body
+    dataflow = DataFlow(False)
+    dataflow.code = list(HEADER)
+    dataflow.optimize_method(SimpleNamespace(cfg=cfg))
+    return HEADER + [DEFINE] + body, dataflow.code
+
+
+def run(code, capsys):
+    with pytest.raises(SystemExit) as sys_error:
+        MJIRInterpreter().run(code)
+    assert sys_error.value.code == 0
+    return capsys.readouterr().out
+
+
+def test_loop(capsys):
+    original, optimized = optimize(list(LOOP))
+    assert run(optimized, capsys) == run(original, capsys) == "10"
+
+    # i and s change along the back edge: nothing in the loop is folded
+    assert ("cbranch", "%6", "%for.body", "%for.end") in optimized
+    assert ("add_int", "%11", "%10", "%12") in optimized
+    assert ("jump", "%for.cond") in optimized
+
+
+def test_dead_store(capsys):
+    original, optimized = optimize(list(LOOP))
+    assert run(optimized, capsys) == run(original, capsys)
+    assert not [instr for instr in optimized if "%d" in instr or "%3" in instr]
+
+
+def test_dead_chain(capsys):
+    original, optimized = optimize(list(CHAIN))
+    assert run(optimized, capsys) == run(original, capsys) == "4"
+    assert optimized == HEADER + [
+        DEFINE,
+        ("literal_int", 4, "%4"),
+        ("print_int", "%4"),
+        ("return_void",),
+    ]
+
+
+def test_constant_fold(capsys):
+    original, optimized = optimize(list(FOLD))
+    assert run(optimized, capsys) == run(original, capsys) == "6"
+    assert not [instr for instr in optimized if instr[0] == "mul_int"]
+    assert optimized[-2:] == [("print_int", "%8"), ("return_void",)]
+    assert ("literal_int", 6, "%8") in optimized
+
+
+def test_constant_cbranch(capsys):
+    original, optimized = optimize(list(FOLD))
+    # 6 < 5 is known to be false: the branch and the then block are gone
+    assert not [instr for instr in optimized if instr[0] == "cbranch"]
+    assert ("if.then:",) not in optimized
+    assert ("print_int", "%7") not in optimized
+
+
+
+def sweep_lv(use, def_, succs, order):
+    """Live variables by sweeping every block until nothing changes, as
+    lv_solve did before it had a worklist. Also returns the sweep count."""
+    lv_in = [0] * len(use)
+    lv_out = [0] * len(use)
+    sweeps, changed = 0, True
+    while changed:
+        sweeps, changed = sweeps + 1, False
+        for index in order:
+            lv_out[index] = 0
+            for succ in succs[index]:
+                lv_out[index] |= lv_in[succ]
+            in_ = use[index] | (lv_out[index] & ~def_[index])
+            if in_ != lv_in[index]:
+                lv_in[index], changed = in_, True
+    return lv_in, lv_out, sweeps
+
+
+def test_lv_back_edge():
+    # entry 0 -> cond 1 -> body 2 -> latch 3 -> cond 1, and cond 1 -> exit 4;
+    # the registers a, b and c are the bits 1, 2 and 4
+    succs = [[1], [2, 4], [3], [1], []]
+    preds = [[], [0, 3], [1], [2], [1]]
+    use = [0, 1, 4, 2, 0]
+    def_ = [7, 0, 2, 4, 0]
+    order = [4, 3, 2, 1, 0]
+
+    expected_in, expected_out, sweeps = sweep_lv(use, def_, succs, order)
+    # a, used in cond, only reaches the latch through the back edge
+    assert sweeps > 2
+    assert expected_in[3] == 3
+
+    lv_in = [0] * len(use)
+    lv_out = [0] * len(use)
+    lv_solve(use, def_, preds, succs, order, lv_in, lv_out)
+    assert lv_in == expected_in
+    assert lv_out == expected_out